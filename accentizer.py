@@ -1,29 +1,357 @@
-from dictionary import AccentDictionary
-from utilities import count_vovels, get_first_vovel_pos
+import argparse
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from typing import List, Tuple
+
+from dictionary import STORAGES, MORPHS
+from metrics import Metrics
+from registry import registry
+from utilities import count_vovels, get_first_vovel_pos, find_words, put_accents, normalize, vovel_stats
+
+HOMOGRAPH = object() # lookup result of words whose accent depends on the sentence
 
 
 class Accentizer:
     single_vovel_accent = False
+    resolve_homographs = True
+    morph_cache_size = 100000 # pymorphy2 parses and Morph conversions kept by the homograph resolver
+    predict_oov = False # guess accents of unknown words with the suffix model
+    oov_min_confidence = 0.0
+
+
+
+    def __init__(self, storage='dict', path='.', metrics=None):
+        # the dictionary and suffix model are loaded once per process and shared, so creating an Accentizer is cheap
+        self.handle = registry.handle(storage, path)
+
+        self.metrics = metrics # optional Metrics, counts lookup outcomes and times stages
+        if metrics is not None:
+            metrics.load_seconds = self.dictionary.load_seconds
+
+        self.suffix_model = registry.suffix_model(self.dictionary)
+
+        self.resolver = None # taken from the registry on first homograph, loading pymorphy2 takes a while
+        self.analysis = None # (tuple of words, SentenceAnalysis) of the last sentence with a homograph
 
+    @property
+    def dictionary(self):
+        # current version, methods take it once so a reload in the middle of a call is not seen
+        return self.handle.current
 
+    def get_accent(self, word, words=None, sentence=None, index=None):
+        # words: tokens of the sentence of the word, found in sentence if not given,
+        # index: position of the word among them, its first occurrence if not given
+        dictionary = self.dictionary
+        pos = self.lookup(word, dictionary=dictionary)
+        if pos is HOMOGRAPH:
+            if words is None:
+                words = find_words(sentence) if sentence is not None else [word]
+            if index is None or not 0 <= index < len(words) or words[index] != word:
+                index = words.index(word) if word in words else None
+            if index is None:
+                words, index = [word], 0
+            return self.resolve_homograph(word, index, words, dictionary)
+        return pos
 
-    dictionary = AccentDictionary()
+    def lookup(self, word, vovels_count=None, first_vovel_pos=None, dictionary=None):
+        # accent position, -1 if word needs no accent, None if unknown or HOMOGRAPH.
+        # vovels_count and first_vovel_pos may be precomputed by vovel_stats
+        if self.metrics is None:
+            return self.classify(word, vovels_count, first_vovel_pos, dictionary)[1]
 
-    def __init__(self):
-        self.dictionary.load()
+        start = time.perf_counter()
+        outcome, pos = self.classify(word, vovels_count, first_vovel_pos, dictionary)
+        self.metrics.observe('lookup', time.perf_counter() - start)
+        if outcome is not None:
+            self.metrics.count(outcome)
+        return pos
+
+    def classify(self, word, vovels_count=None, first_vovel_pos=None, dictionary=None):
+        # (outcome, lookup result), homographs are counted when they are resolved
 
-    def get_accent(self, word, words, sentence):
         # check if already accentized
-        if 'ё' in word or '́' in word or 'Ё' in word: return -1
+        if 'ё' in word or '́' in word or 'Ё' in word: return 'accented', -1
 
-        vovels_count = count_vovels(word)
+        if vovels_count is None:
+            vovels_count = count_vovels(word)
 
-        if vovels_count == 0: return -1
+        if vovels_count == 0: return 'no_vowel', -1
         if vovels_count == 1:
-            return get_first_vovel_pos(word) if self.single_vovel_accent else -1
+            if not self.single_vovel_accent: return 'single_vowel', -1
+            return 'single_vowel', first_vovel_pos if first_vovel_pos is not None else get_first_vovel_pos(word)
+
+        # look in accent dictionary, keys are normalized and positions are valid for any case of the word
+        if dictionary is None:
+            dictionary = self.dictionary
+        key = normalize(word)
+        pos = dictionary.accents.get(key)
+        if pos is not None:
+            return 'hit', pos
+
+        if self.resolve_homographs:
+            table = dictionary.homograph_table(key)
+            if table == 'homographs':
+                return None, HOMOGRAPH
+            if table == 'homographs_unresolvable':
+                return 'unresolvable', None
+
+        if self.predict_oov and self.suffix_model is not None:
+            prediction = self.suffix_model.predict(key)
+            if prediction is not None and prediction[1] >= self.oov_min_confidence:
+                return 'predicted', prediction[0]
+
+        return 'miss', None
+
+    def resolve_homograph(self, word, index, words, dictionary=None):
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
+        # the sentence is analyzed once for all its homographs
+        resolver = self.get_resolver()
+        # keyed by the tokens, calls of get_accent with the same sentence find new lists of them
+        words = tuple(words)
+        if self.analysis is None or self.analysis[0] != words:
+            self.analysis = (words, resolver.analyze(words))
+
+        if dictionary is None:
+            dictionary = self.dictionary
+        pos = resolver.resolve(self.analysis[1], index, dictionary.homographs[normalize(word)][MORPHS])
+
+        if metrics is not None:
+            metrics.observe('homograph', time.perf_counter() - start)
+            metrics.count('homograph_resolved' if pos is not None else 'homograph_unresolved')
+        return pos
+
+    def get_resolver(self):
+        if self.resolver is None:
+            self.resolver = registry.resolver(self.morph_cache_size)
+        return self.resolver
+
+    def preload(self):
+        # loads what lookups would load lazily, so forked workers share it instead of loading their own copies
+        if self.resolve_homographs:
+            dictionary = self.dictionary
+            for name in ('homographs', 'homographs_unresolvable'):
+                getattr(dictionary, name)
+            self.get_resolver()
+
+    def accentize_batch(self, texts) -> List[List[Tuple[str, int]]]:
+        # one (word, accent position) list per text, distinct words of the batch are looked up once
+        # with vowels counted for all of them in one pass
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
+        dictionary = self.dictionary # the whole batch is looked up in one version
+        texts_words = [find_words(text) for text in texts]
+        distinct = list(dict.fromkeys(word for words in texts_words for word in words))
+        classify = self.classify
+        known = {word: classify(word, count, first, dictionary)
+                 for word, count, first in zip(distinct, *vovel_stats(distinct))}
+        result = []
+
+        for words in texts_words:
+            accents = []
+            for i, word in enumerate(words):
+                outcome, pos = known[word]
+                if pos is HOMOGRAPH:
+                    pos = self.resolve_homograph(word, i, words, dictionary)
+                elif metrics is not None:
+                    metrics.count(outcome)
+                accents.append((word, pos))
+            result.append(accents)
+
+        if metrics is not None:
+            metrics.observe('batch', time.perf_counter() - start)
+        return result
+
+    def accentize_parallel(self, texts, processes=None, batch_size=1000):
+        # same results as accentize_batch, one accents list per text, computed by a process pool
+        batches = ((batch,) for batch in chunks(texts, batch_size))
+        for accents in map_batches(self, accentize_texts, batches, processes):
+            yield from accents
+
+
+_worker_accentizer = None
+
+
+SETTINGS = ('single_vovel_accent', 'resolve_homographs', 'morph_cache_size', 'predict_oov', 'oov_min_confidence')
+
+
+def _init_worker(storage, path, settings, metrics):
+    # used only without fork, every worker loads its own dictionary
+    global _worker_accentizer
+    _worker_accentizer = Accentizer(storage, path, Metrics() if metrics else None)
+    for name, value in settings.items():
+        setattr(_worker_accentizer, name, value)
+
+
+def _call_worker(func, batch):
+    # returns the result and the metrics of this call, the parent merges them into its own
+    metrics = _worker_accentizer.metrics
+    if metrics is not None:
+        metrics.reset()
+    return func(_worker_accentizer, *batch), metrics
+
+
+def _merge_result(accentizer, call):
+    result, metrics = call
+    if metrics is not None:
+        accentizer.metrics.merge(metrics)
+    return result
+
+
+def map_batches(accentizer, func, batches, processes=None):
+    # yields func(accentizer, *batch) for every batch in order, computed by worker processes.
+    # Workers are forked after the dictionary is loaded and frozen out of the garbage collector,
+    # so its pages are shared with the parent instead of being copied into every worker.
+    global _worker_accentizer
+    processes = processes or os.cpu_count()
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        initializer, initargs = None, ()
+    else:
+        context = multiprocessing.get_context('spawn')
+        settings = {name: getattr(accentizer, name) for name in SETTINGS}
+        initializer, initargs = _init_worker, (accentizer.dictionary.storage, accentizer.dictionary.path, settings,
+                                               accentizer.metrics is not None)
+
+    _worker_accentizer = accentizer
+    if context.get_start_method() == 'fork':
+        accentizer.preload()
+    gc.collect()
+    gc.freeze()
+
+    try:
+        with context.Pool(processes, initializer, initargs) as pool:
+            # bounded number of batches in flight, input is consumed only as fast as results are taken
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.apply_async(_call_worker, (func, batch)))
+                if len(pending) >= 2 * processes:
+                    yield _merge_result(accentizer, pending.popleft().get())
+            while pending:
+                yield _merge_result(accentizer, pending.popleft().get())
+    finally:
+        gc.unfreeze()
+        _worker_accentizer = None
+
+
+def accentize_texts(accentizer, texts):
+    return accentizer.accentize_batch(texts)
+
+
+def read_lines(files):
+    if not files:
+        yield from sys.stdin
+        return
+
+    for file in files:
+        if file == '-':
+            yield from sys.stdin
+            continue
+        with open(file, encoding='utf-8') as f:
+            yield from f
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def accentize_lines(accentizer, lines, jsonl=False, field='text'):
+    # returns output lines and number of tokens
+    if jsonl:
+        records = [json.loads(line) for line in lines if line.strip()]
+        texts = [record[field] for record in records]
+    else:
+        texts = lines
+
+    accents = accentizer.accentize_batch(texts)
+    tokens = sum(len(x) for x in accents)
+
+    if jsonl:
+        output = []
+        for record, text, text_accents in zip(records, texts, accents):
+            record[field] = put_accents(text, text_accents)
+            output.append(json.dumps(record, ensure_ascii=False) + '\n')
+    else:
+        output = [put_accents(text, text_accents) for text, text_accents in zip(texts, accents)]
+
+    return output, tokens
+
+
+def accentize_stream(accentizer, lines, jsonl=False, field='text', batch_size=1000, stats=None, processes=1):
+    # yields output lines, only a few batches of batch_size input lines are held in memory
+    batches = ((batch, jsonl, field) for batch in chunks(lines, batch_size))
+
+    if processes > 1:
+        results = map_batches(accentizer, accentize_lines, batches, processes)
+    else:
+        results = (accentize_lines(accentizer, *batch) for batch in batches)
+
+    for output, tokens in results:
+        if stats is not None:
+            stats['lines'] += len(output)
+            stats['tokens'] += tokens
+        yield from output
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Put accent marks into russian text')
+    parser.add_argument('files', nargs='*', help='input files, stdin if omitted')
+    parser.add_argument('-o', '--output', help='output file, stdout if omitted')
+    parser.add_argument('--jsonl', action='store_true', help='input lines are json objects')
+    parser.add_argument('--field', default='text', help='text field of jsonl objects')
+    parser.add_argument('--batch-size', type=int, default=1000, help='lines per batch')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='worker processes')
+    parser.add_argument('--storage', choices=STORAGES, default='dict', help='accents table storage')
+    parser.add_argument('--dictionary', default='.', help='dictionary directory')
+    parser.add_argument('--single-vovel', action='store_true', help='accentize words with one vovel')
+    parser.add_argument('--predict-oov', action='store_true', help='guess accents of unknown words by their endings')
+    parser.add_argument('--metrics', action='store_true', help='print lookup metrics to stderr at the end')
+    parser.add_argument('--oov-min-confidence', type=float, default=0.0, help='minimal confidence of a guess')
+    args = parser.parse_args(args)
+
+    # dictionary loading reports to stdout, keep it out of the output stream
+    with contextlib.redirect_stdout(sys.stderr):
+        accentizer = Accentizer(args.storage, args.dictionary, Metrics() if args.metrics else None)
+    accentizer.single_vovel_accent = args.single_vovel
+    accentizer.predict_oov = args.predict_oov
+    accentizer.oov_min_confidence = args.oov_min_confidence
+
+    stats = {'lines': 0, 'tokens': 0}
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+
+    try:
+        for line in accentize_stream(accentizer, read_lines(args.files), args.jsonl, args.field, args.batch_size, stats,
+                                       args.processes):
+            output.write(line)
+    finally:
+        if output is not sys.stdout:
+            output.close()
 
-        # look in accent dictionary
-        if word in self.dictionary.accents:
-            return self.dictionary.accents[word]
+    elapsed = time.perf_counter() - start
+    print('lines: {}, tokens: {}, time: {:.2f} s, {:.0f} tokens/s'.format(
+        stats['lines'], stats['tokens'], elapsed, stats['tokens'] / elapsed if elapsed > 0 else 0), file=sys.stderr)
+    if accentizer.metrics is not None:
+        print(json.dumps(accentizer.metrics.snapshot(), indent=2), file=sys.stderr)
 
 
+if __name__ == "__main__":
+    main()
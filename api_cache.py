@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+PAGES = 'page' # wikitext by language:title, invalidated by revision
+TEMPLATES = 'expand' # expanded wikitext by language:template text, invalidated by ttl only
+
+
+class ApiCache:
+    # Persistent cache of wiktionary API responses in sqlite, keyed by kind and title or template text.
+    # Entries older than ttl seconds are misses; revalidate() refreshes cached pages whose revision
+    # is still current, so a rerun doesn't refetch unchanged pages however old they are.
+    # Safe to share between threads, forked processes open their own connection.
+
+    def __init__(self, file_name='wiktionary_cache.sqlite', ttl=30 * 24 * 3600):
+        self.file_name = file_name
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def connect(self):
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.file_name, check_same_thread=False, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS responses (kind TEXT, key TEXT, value TEXT, '
+                                    'revision INTEGER, fetched REAL, PRIMARY KEY (kind, key))')
+            self.pid = os.getpid()
+        return self.connection
+
+    def lookup(self, kind, key) -> Optional[str]:
+        with self.lock:
+            row = self.connect().execute('SELECT value, fetched FROM responses WHERE kind = ? AND key = ?',
+                                         (kind, key)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def get(self, kind, key) -> Optional[str]:
+        value = self.lookup(kind, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def has(self, kind, key):
+        # like get, without counting it
+        return self.lookup(kind, key) is not None
+
+    def put(self, kind, key, value, revision=None):
+        with self.lock:
+            self.connect().execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                                   (kind, key, value, revision, time.time()))
+
+    def keys(self, kind=PAGES) -> Iterable[str]:
+        with self.lock:
+            return [row[0] for row in self.connect().execute('SELECT key FROM responses WHERE kind = ?', (kind,))]
+
+    def revalidate(self, revisions: Dict[str, Optional[int]]):
+        # revisions are {key: current revision, 0 for a missing page}:
+        # cached pages with the current revision are refreshed, the others dropped
+        fresh = stale = 0
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            connection.execute('BEGIN')
+            for key, revision in revisions.items():
+                row = connection.execute('SELECT revision FROM responses WHERE kind = ? AND key = ?',
+                                         (PAGES, key)).fetchone()
+                if row is None: continue
+                if row[0] == revision:
+                    connection.execute('UPDATE responses SET fetched = ? WHERE kind = ? AND key = ?', (now, PAGES, key))
+                    fresh += 1
+                else:
+                    connection.execute('DELETE FROM responses WHERE kind = ? AND key = ?', (PAGES, key))
+                    stale += 1
+            connection.execute('COMMIT')
+        print('cache: revalidated', fresh, 'pages, dropped', stale)
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / calls if calls > 0 else 0.0}
+
+    def close(self):
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
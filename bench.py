@@ -0,0 +1,152 @@
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from compact import CompactAccents
+from dictionary import STORAGES
+
+LETTERS = 'бвгджзклмнпрстфхцчшщ'
+VOWELS = 'аеиоуыэюя'
+
+
+def random_word(rnd, syllables):
+    return ''.join(rnd.choice(LETTERS) + rnd.choice(VOWELS) for _ in range(syllables)) + rnd.choice(LETTERS)
+
+
+def make_dictionary(directory, size, seed=0):
+    # synthetic accents table of size forms with 2-5 syllables, stored as pickle and as compiled table
+    rnd = random.Random(seed)
+    accents = {}
+    while len(accents) < size:
+        syllables = rnd.randint(2, 5)
+        # the vowel of syllable k is at index 2k - 1, accent positions are vowel indices
+        accents[random_word(rnd, syllables)] = 2 * rnd.randint(1, syllables) - 1
+
+    with open(os.path.join(directory, 'accents.pickle'), 'wb') as f:
+        pickle.dump(accents, f)
+    CompactAccents.from_dict(accents).save(os.path.join(directory, 'accents.bin'))
+
+    return accents
+
+
+def make_tokens(accents, count, seed=0):
+    rnd = random.Random(seed + 1)
+    known = list(accents)
+    misses = []
+    while len(misses) < 1000:
+        word = random_word(rnd, rnd.randint(2, 5)) + 'ь'
+        if word not in accents: misses.append(word)
+
+    return {
+        'hit': [rnd.choice(known) for _ in range(count)],
+        'miss': [rnd.choice(misses) for _ in range(count)],
+        'single_vowel': [random_word(rnd, 1) for _ in range(count)],
+        'accented': [w[:accents[w] + 1] + '́' + w[accents[w] + 1:] for w in (rnd.choice(known) for _ in range(count))],
+    }
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def best_rate(func, tokens, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(tokens)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return len(tokens) / best
+
+
+def run_storage(storage, directory, count, repeat, seed):
+    # runs in a fresh process, so load time and memory are not affected by other storages
+    from accentizer import Accentizer
+
+    rss_before = rss_bytes()
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        accentizer = Accentizer(storage, directory)
+        load_seconds = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    with open(os.path.join(directory, 'accents.pickle'), 'rb') as f:
+        tokens = make_tokens(pickle.load(f), count, seed)
+
+    get_accent = accentizer.get_accent
+
+    def single(words):
+        for word in words:
+            get_accent(word)
+
+    result = {
+        'storage': storage,
+        'load_seconds': load_seconds,
+        'rss_after_load_bytes': rss_after,
+        'rss_load_delta_bytes': rss_after - rss_before,
+        'accents_table_bytes': accentizer.dictionary.memory_usage()['accents'],
+        'get_accent_tokens_per_second': {kind: best_rate(single, words, repeat) for kind, words in tokens.items()},
+    }
+
+    texts = [' '.join(tokens['hit'][i:i + 10]) for i in range(0, count, 10)]
+    result['accentize_batch_tokens_per_second'] = best_rate(accentizer.accentize_batch, texts, repeat) * 10
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of dictionary load and lookups')
+    parser.add_argument('--size', type=int, default=100000, help='synthetic dictionary size')
+    parser.add_argument('--tokens', type=int, default=100000, help='tokens per measurement')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the best is kept')
+    parser.add_argument('--storage', choices=STORAGES, action='append', help='storages to measure, all by default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='json results file, stdout if omitted')
+    parser.add_argument('--child', help=argparse.SUPPRESS) # directory of a generated dictionary
+    args = parser.parse_args(args)
+
+    if args.child:
+        json.dump(run_storage(args.storage[0], args.child, args.tokens, args.repeat, args.seed), sys.stdout)
+        return
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'size': args.size,
+        'tokens': args.tokens,
+        'repeat': args.repeat,
+        'storages': [],
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_dictionary(directory, args.size, args.seed)
+        for storage in args.storage or STORAGES:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', directory,
+                                              '--storage', storage, '--tokens', str(args.tokens),
+                                              '--repeat', str(args.repeat), '--seed', str(args.seed)])
+            results['storages'].append(json.loads(output))
+            print(storage, 'done', file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
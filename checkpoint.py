@@ -0,0 +1,102 @@
+import os
+import pickle
+import time
+from typing import List, Optional
+
+
+class Checkpoint:
+    # Progress of a resumable build over an ordered sequence of words:
+    # index is the number of words processed, word the last of them (checked on resume),
+    # pending the words whose lookup failed and must be retried,
+    # journal_offset the size of the dictionary journal when the checkpoint was saved.
+    # The dictionary must be saved before the checkpoint, so the checkpoint never runs ahead of it.
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.index = 0
+        self.word: Optional[str] = None
+        self.pending: List[str] = []
+        self.journal_offset = 0
+        self.saved = time.monotonic()
+
+    def load(self):
+        if not os.path.exists(self.file_name):
+            return False
+        with open(self.file_name, 'rb') as f:
+            state = pickle.load(f)
+        self.index, self.word, self.pending, self.journal_offset = \
+            state['index'], state['word'], state['pending'], state['journal_offset']
+        print('checkpoint: resuming after', self.index, self.word, 'pending', len(self.pending))
+        return True
+
+    def save(self, journal_offset=None):
+        if journal_offset is not None:
+            self.journal_offset = journal_offset
+        state = {'index': self.index, 'word': self.word, 'pending': self.pending, 'journal_offset': self.journal_offset}
+
+        # written aside and renamed, a crash leaves either the old or the new checkpoint
+        temp = self.file_name + '.tmp'
+        with open(temp, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.file_name)
+        self.saved = time.monotonic()
+
+    def due(self, interval):
+        # True if the last save is more than interval seconds old
+        return time.monotonic() - self.saved >= interval
+
+    def advance(self, word):
+        self.index += 1
+        self.word = word
+
+    def check_journal(self, journal_offset):
+        # a journal shorter than at the last checkpoint lost changes of words the cursor is past
+        if journal_offset < self.journal_offset:
+            print('checkpoint: journal is shorter than at the checkpoint ({} < {}), changes may be lost'
+                  .format(journal_offset, self.journal_offset))
+
+    def defer(self, word):
+        # the word's lookup failed, it is retried first on the next run
+        self.pending.append(word)
+
+    def after_cursor(self, words):
+        # the words after the cursor. The word before it must be the checkpoint's word,
+        # or the sequence has changed since
+        for i, word in enumerate(words):
+            if i < self.index - 1:
+                continue
+            if i == self.index - 1:
+                if word != self.word:
+                    raise ValueError('checkpoint: word {} is {}, not {}, the word list has changed'
+                                     .format(i, word, self.word))
+                continue
+            yield word
+
+    def resume(self, words, dictionary=None, interval=0.0):
+        # Yields the pending words, then the words after the cursor.
+        # A word is done when the next one is requested, so a word whose processing raised is redone.
+        # The dictionary, then the checkpoint are saved after a word once interval seconds have passed
+        for word in list(self.pending):
+            yield word
+            self.pending.remove(word) # deferred again, it's still there once
+            self.commit(dictionary, interval)
+
+        for word in self.after_cursor(words):
+            yield word
+            self.advance(word)
+            self.commit(dictionary, interval)
+
+        self.commit(dictionary)
+
+    def commit(self, dictionary=None, interval=0.0):
+        # saves the dictionary, then the checkpoint, if the last save is more than interval seconds old
+        if self.due(interval):
+            if dictionary is not None:
+                dictionary.save_if_changed()
+            self.save(dictionary.journal_offset if dictionary is not None else None)
+
+    def remove(self):
+        if os.path.exists(self.file_name):
+            os.remove(self.file_name)
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from requests import RequestException
+
+from checkpoint import Checkpoint
+from dictionary import AccentDictionary, WordNotFound, apply_variants, find_variants, skip_words
+from morph_cache import CachedMorphAnalyzer
+from paradigm_cache import paradigm_cache
+from wiktparser import use_api_cache, use_local_dump
+
+
+class RateLimiter:
+    # starts at most rate lookups per second, evenly spaced
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            if self.next > now:
+                await asyncio.sleep(self.next - now)
+            self.next = max(now, self.next) + self.interval
+
+
+class Crawler:
+    # Homograph refresh with many wiktionary lookups in flight.
+    # find_variants runs in executor threads, at most concurrency at once, started no faster than rate per second,
+    # and is retried with exponential backoff on network errors. Results are applied to the dictionary
+    # by the event loop in word order through a reorder buffer, so the dictionary ends up as after a serial run.
+    # Lookups see the homograph tables as they were when the crawl started.
+
+    def __init__(self, dictionary, morpher, checkpoint, concurrency=8, rate=5.0, retries=5, backoff=1.0):
+        self.dictionary = dictionary
+        self.morpher = morpher
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.failed = [] # (word, error) of words that can't be looked up
+        # membership snapshot for find_variants, so lookups don't depend on the order results arrive in
+        self.known = SimpleNamespace(homographs=frozenset(dictionary.homographs),
+                                     homographs_unresolvable=frozenset(dictionary.homographs_unresolvable))
+
+    async def lookup(self, word, semaphore, limiter, executor):
+        # variants of the word, None if its lookup keeps failing
+        if word in skip_words:
+            return []
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                await limiter.acquire()
+                try:
+                    return await loop.run_in_executor(executor, find_variants, word, self.known, self.morpher)
+                except RequestException as e:
+                    error = e
+                except WordNotFound as e:
+                    self.failed.append((word, e))
+                    return []
+
+            delay = self.backoff * 2 ** attempt * (1 + random.random() / 2)
+            print('lookup failed, retry in {:.1f}s'.format(delay), word, repr(error))
+            await asyncio.sleep(delay)
+
+        return None
+
+    async def run(self, words):
+        # words are (word, from cursor) pairs, the cursor is moved only past words of the checkpoint's sequence
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate)
+        window = 4 * self.concurrency # lookups started ahead of the next word to apply
+
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            pending = {} # index: ((word, from cursor), task), the reorder buffer
+            words = iter(enumerate(words))
+            next_index = 0
+            exhausted = False
+
+            while True:
+                while not exhausted and len(pending) < window:
+                    item = next(words, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    index, entry = item
+                    pending[index] = (entry, asyncio.ensure_future(self.lookup(entry[0], semaphore, limiter, executor)))
+
+                if next_index not in pending:
+                    break
+
+                (word, from_cursor), task = pending.pop(next_index)
+                variants = await task
+                next_index += 1
+
+                if variants is None:
+                    self.checkpoint.defer(word)
+                else:
+                    try:
+                        apply_variants(self.dictionary, variants)
+                    except Exception as e:
+                        self.failed.append((word, e))
+                if from_cursor:
+                    self.checkpoint.advance(word)
+                else:
+                    self.checkpoint.pending.remove(word) # deferred again, it's still there once
+                self.checkpoint.commit(self.dictionary, 5)
+
+        self.checkpoint.commit(self.dictionary)
+        for word, error in self.failed:
+            print('failed', word, repr(error))
+        print('paradigm cache:', paradigm_cache.stats())
+
+    def crawl(self, words):
+        # pending words of the checkpoint go first, then the words after its cursor.
+        # A pending word is removed once it's done, so an interrupted crawl retries the rest of them
+        items = [(word, False) for word in list(self.checkpoint.pending)]
+        items += [(word, True) for word in self.checkpoint.after_cursor(words)]
+        asyncio.run(self.run(items))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Refreshes homographs of homographs_old from wiktionary')
+    parser.add_argument('--dictionary', default='.', help='dictionary directory')
+    parser.add_argument('--dump', help='multistream dump to read pages from instead of the API')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='lookups in flight')
+    parser.add_argument('--rate', type=float, default=5.0, help='lookups started per second, 0 for no limit')
+    parser.add_argument('--retries', type=int, default=5, help='retries of a lookup after network errors')
+    args = parser.parse_args(args)
+
+    if args.dump:
+        use_local_dump(args.dump)
+    use_api_cache()
+
+    dictionary = AccentDictionary(path=args.dictionary)
+    dictionary.load()
+
+    checkpoint = Checkpoint(dictionary.file_name('build_checkpoint'))
+    checkpoint.load()
+    checkpoint.check_journal(dictionary.journal_offset)
+
+    crawler = Crawler(dictionary, CachedMorphAnalyzer(), checkpoint, args.concurrency, args.rate, args.retries)
+    crawler.crawl(dictionary.homographs_old)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,497 @@
+import contextlib
+import copy
+import functools
+import io
+import mmap
+import os
 import pickle
 import re
+import sys
+import tempfile
+import time
 from os import path
 from pprint import pprint
-from typing import Dict, Set, Tuple
+from typing import Dict, List, Set, Tuple
 
-import pymorphy2
+from requests import RequestException
 
+from checkpoint import Checkpoint
+from compact import CompactAccents, CompactObjects, CompactTable, open_table
 from morph import Morph
-from utilities import count_vovels
-from wiktparser import parse_wikt_ru
+from morph_cache import CachedMorphAnalyzer
+from paradigm_cache import paradigm_cache
+from utilities import count_vovels, count_vovels_batch, normalize
+from wiktparser import parse_wikt_ru, use_api_cache, use_local_dump
 
 POS_SET = 0
 MORPHS = 1
 
-class AccentDictionary:
+STORAGES = ('dict', 'compact', 'mapped')
+TABLES = ('accents', 'homographs_old', 'homographs', 'homographs2', 'homographs_unresolvable')
+SAVED_TABLES = ('accents', 'homographs', 'homographs_unresolvable')
+HOMOGRAPH_TABLES = ('homographs', 'homographs_unresolvable')
+
+
+def object_bytes(obj, seen=None):
+    # approximate deep size of a table, objects shared between entries are counted once
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, CompactTable):
+        return obj.nbytes()
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(object_bytes(k, seen) + object_bytes(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(object_bytes(x, seen) for x in obj)
+    elif hasattr(obj, '__dict__'):
+        size += object_bytes(obj.__dict__, seen)
+    return size
+
+
+def normalize_table(table, dropped):
+    # tables are keyed by normalized word forms, (key, value) of forms folding into a taken key are added
+    # to dropped for AccentDictionary.merge_folded()
+    if isinstance(table, set):
+        return {normalize(x) for x in table}
+
+    normalized = {}
+    for word, value in table.items():
+        key = normalize(word)
+        if key in normalized:
+            dropped.append((key, value))
+        else:
+            normalized[key] = value
+    return normalized
+
+
+def writable_table(name, table):
+    # independent plain copy of a table, compact tables are read-only
+    if isinstance(table, CompactTable):
+        return set(table) if name == 'homographs2' else dict(table.items()) # keys is the key blob of a CompactTable
+    if name == 'accents':
+        return dict(table)
+    return copy.deepcopy(table)
+
+
+class JournalError(Exception):
+    # a replayed call raised where the recorded one didn't, or the other way round
+    pass
+
+
+def journaled(method):
+    # Appends a top level call of a mutating method to the journal if it changed the dictionary.
+    # Calls made from inside another mutation are replayed by that mutation.
+    # The record keeps the name of the exception the call raised after its changes, None if it returned
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        changed, self.changed = self.changed, False
+        self.journal_depth += 1
+        raised = None
+        try:
+            return method(self, *args, **kwargs)
+        except Exception as e: # an interrupted call is recorded as returned, its replay completes it
+            raised = type(e).__name__
+            raise
+        finally:
+            self.journal_depth -= 1
+            if self.journal_depth == 0 and self.changed:
+                self.pending.append(pickle.dumps((method.__name__, args, kwargs, raised), pickle.HIGHEST_PROTOCOL))
+            self.changed = self.changed or changed
+
+    return wrapper
+
+
+class TableFile:
+    # Table file opened by load(). Reads go through the open descriptor, so they keep returning
+    # the table of that load after compact() or compile() replaced the file with os.replace
+    fd = None
+
+    def __init__(self, file_name):
+        self.name = file_name
+        self.fd = os.open(file_name, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+
+    def mtime(self):
+        return os.fstat(self.fd).st_mtime
+
+    def read(self):
+        # no shared file position, threads loading tables of one version don't interfere
+        with mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ) as mapped:
+            return pickle.loads(mapped)
+
+    def __del__(self):
+        if self.fd is not None:
+            os.close(self.fd)
+
+
+class LazyTable:
+    # Table loaded from disk on first access after AccentDictionary.load().
+    # The loaded table is stored in the instance __dict__ under the same name,
+    # so later accesses don't go through the descriptor at all.
+    def __init__(self, default=dict):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        table = instance.load_table(self.name) if instance.loaded else None
+        if table is None:
+            table = self.default()
+        instance.__dict__[self.name] = table
+        instance.start_sizes[self.name] = len(table)
+        return table
 
-    def __init__(self):
+
+class AccentDictionary:
+    # homograph tables are only needed for homograph tokens, plain lookups never load them
+    homographs_old: Dict[str, Tuple[Set[int], Dict[str, int]]] = LazyTable() # Word form: [Set[accent positions], {morphological tag: position}]
+    homographs: Dict[str, Tuple[Set[int], Dict[Morph, int]]] = LazyTable()
+    homographs2: Set[str] = LazyTable(set)
+    homographs_unresolvable: Dict[str, Tuple[Set[int], Dict[Morph, Set[int]]]] = LazyTable() # Words
+    # table name: keys of the homograph tables, lets lookups of other words skip loading them
+    homograph_keys: Dict[str, Set[str]] = LazyTable()
+
+    def __init__(self, storage='dict', path='.'):
+        assert storage in STORAGES
+        # 'compact' keeps accents in a read-only CompactAccents after load,
+        # 'mapped' opens tables compiled by compile() read-only in place and falls back to pickles
+        self.storage = storage
+        self.path = path
         self.accents: Dict[str, int] = {} # Word form : accent position
-        self.homographs_old: Dict[str, Tuple[Set[int], Dict[str, int]]] = {} # Word form: [Set[accent positions], {morphological tag: position}]
-        self.homographs: Dict[str, Tuple[Set[int], Dict[Morph, int]]] = {}
-        self.homographs_unresolvable: Dict[str, Tuple[Set[int], Dict[Morph, Set[int]]]] = {} # Words
         self.changed = False
+        self.loaded = False
+        self.start_sizes: Dict[str, int] = {}
+        self.load_seconds: Dict[str, float] = {} # table name: seconds its last load took
+        self.writable = False # clones load every table as plain dicts and sets, see clone()
+        self.mapped_homographs = False # homograph tables are compiled and opened in place, see load()
+        self.normalized = True # False for pickles of old versions, they are normalized on every load until compact()
+        self.table_files: Dict[str, TableFile] = {} # table name: file it is read from, see pin_files()
+        self.dropped: Dict[str, List[Tuple[str, object]]] = {} # table name: entries normalize_table dropped
+        # Mutations since the last snapshot are appended to the journal file as pickled
+        # (method name, args, kwargs, raised exception name) records: save() appends the pending ones,
+        # load() replays the journal over the tables, compact() folds it into the tables
+        self.pending: List[bytes] = []
+        self.journal_depth = 0
+        self.journal_offset = 0 # journal size after the last load or save
+
+    def file_name(self, name, extension='.pickle', directory=None):
+        return path.join(self.path if directory is None else directory, name + extension)
+
+    def pin_files(self):
+        # Opens the file of every table when the version is loaded, lazy loads read these files.
+        # A published version keeps reading its own tables after compact() or compile() replaced them,
+        # a table whose file didn't exist at load() stays empty
+        files = {}
+        for name in TABLES + ('homograph_keys',):
+            file_names = [self.file_name(name)]
+            if self.storage == 'mapped' and name != 'homograph_keys':
+                file_names.insert(0, self.file_name(name, '.bin'))
+            for file_name in file_names:
+                try:
+                    files[name] = TableFile(file_name)
+                    break
+                except FileNotFoundError:
+                    pass
+        return files
+
+    def load_table(self, name):
+        start = time.perf_counter()
+        table = None
+        table_file = self.table_files.get(name)
+
+        if name == 'homograph_keys':
+            table = self.load_homograph_keys()
+
+        elif table_file is None:
+            pass
+
+        elif table_file.name.endswith('.bin'):
+            table = open_table(table_file.name, table_file.fd)
+            if self.writable:
+                table = writable_table(name, table)
+
+        else:
+            table = table_file.read()
+            # pickles written by compact() are normalized already
+            if not self.normalized:
+                dropped = self.dropped.setdefault(name, [])
+                table = normalize_table(table, dropped)
+                if dropped:
+                    print('normalize:', len(dropped), name, 'entries fold into taken keys, compact() merges them')
+            if name == 'accents' and self.storage == 'compact' and not self.writable:
+                table = CompactAccents.from_dict(table)
+
+        if table is not None:
+            self.load_seconds[name] = time.perf_counter() - start
+        return table
+
+    def load_homograph_keys(self):
+        # the index written by compact(), rebuilt from the tables if it is missing or older than their pickles
+        index = self.table_files.get('homograph_keys')
+        tables = [self.table_files[name] for name in HOMOGRAPH_TABLES if name in self.table_files]
+        if index is not None and all(index.mtime() >= table.mtime() for table in tables if table.name.endswith('.pickle')):
+            return index.read()
+        # dictionaries saved before the index existed get it written on their first homograph lookup
+        keys = self.make_homograph_keys()
+        try:
+            self.write_homograph_keys(keys)
+        except OSError as e:
+            print('homograph_keys: index not written:', repr(e))
+        return keys
+
+    def make_homograph_keys(self):
+        # tables that aren't loaded are read for their keys and dropped, not kept loaded
+        keys = {}
+        for name in HOMOGRAPH_TABLES:
+            table = self.__dict__[name] if self.is_loaded(name) else self.load_table(name)
+            keys[name] = set(table) if table is not None else set()
+        return keys
+
+    def write_homograph_keys(self, keys):
+        # written aside and renamed over the index, concurrent writers of the same keys don't tear it
+        fd, temp = tempfile.mkstemp('.tmp', 'homograph_keys.', self.path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(keys, f)
+        os.replace(temp, self.file_name('homograph_keys'))
+
+    def homograph_table(self, key):
+        # name of the first homograph table with the normalized key, None if there is none.
+        # Loaded and memory mapped tables are asked directly, the others through homograph_keys,
+        # so lookups of words that aren't homographs never load the homograph tables
+        for name in HOMOGRAPH_TABLES:
+            if self.is_loaded(name) or self.mapped_homographs:
+                if key in getattr(self, name):
+                    return name
+            elif key in self.homograph_keys[name]:
+                return name
+        return None
+
+    def is_loaded(self, name):
+        return name in self.__dict__
+
+    def memory_usage(self):
+        # bytes per loaded table, mapped tables count their whole file
+        return {name: object_bytes(self.__dict__[name]) for name in TABLES if self.is_loaded(name)}
+
+    def clone(self):
+        # Writable copy sharing no mutable state with self, for building the next version of a dictionary
+        # while self is being read. Tables self has not loaded yet are loaded by the clone on first access.
+        clone = AccentDictionary(self.storage, self.path)
+        clone.writable = True
+        clone.loaded = self.loaded
+        clone.changed = self.changed
+        clone.start_sizes = dict(self.start_sizes)
+        clone.load_seconds = dict(self.load_seconds)
+        clone.pending = list(self.pending)
+        clone.journal_offset = self.journal_offset
+        clone.mapped_homographs = self.mapped_homographs
+        clone.normalized = self.normalized
+        clone.table_files = self.table_files
+        clone.dropped = copy.deepcopy(self.dropped)
+        clone.accents = writable_table('accents', self.accents)
+        for name in TABLES:
+            if name != 'accents' and self.is_loaded(name):
+                clone.__dict__[name] = writable_table(name, self.__dict__[name])
+        return clone
 
     def load(self):
-        if path.exists(r'accents.pickle'):
-            with open(r'accents.pickle', 'rb') as f:
-                self.accents = pickle.load(f)
-        if path.exists(r'homographs_old.pickle'):
-            with open(r'homographs_old.pickle', 'rb') as f:
-                self.homographs_old = pickle.load(f)
-        if path.exists(r'homographs.pickle'):
-            with open(r'homographs.pickle', 'rb') as f:
-                self.homographs = pickle.load(f)
-        if path.exists(r'homographs2.pickle'):
-            with open(r'homographs2.pickle', 'rb') as f:
-                self.homographs2 = pickle.load(f)
-        if path.exists(r'homographs_unresolvable.pickle'):
-            with open(r'homographs_unresolvable.pickle', 'rb') as f:
-                self.homographs_unresolvable = pickle.load(f)
-
-        self.start_size = (len(self.accents), len(self.homographs), len(self.homographs_unresolvable))
-        print(*self.start_size)
+        self.normalized = path.exists(self.file_name('format')) or \
+            not any(path.exists(self.file_name(name)) for name in TABLES)
+        self.dropped = {}
+        self.table_files = self.pin_files()
+        accents = self.load_table('accents')
+        if accents is not None:
+            self.accents = accents
+        self.start_sizes = {'accents': len(self.accents)}
+
+        # homograph tables are loaded by LazyTable on first access
+        for name in TABLES + ('homograph_keys',):
+            if name != 'accents':
+                self.__dict__.pop(name, None)
+        self.mapped_homographs = self.storage == 'mapped' and not self.writable and \
+            all(name in self.table_files and self.table_files[name].name.endswith('.bin') for name in HOMOGRAPH_TABLES)
+        self.loaded = True
+        self.pending = []
+
+        self.replay_journal()
+
+        print(len(self.accents))
+
+    def read_journal(self):
+        # records of the journal and the size of its complete part, a torn last record is dropped
+        records = []
+        offset = 0
+        if not path.exists(self.file_name('journal', '.log')):
+            return records, offset
+
+        with open(self.file_name('journal', '.log'), 'rb') as f:
+            while True:
+                try:
+                    records.append(pickle.load(f))
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, AttributeError, IndexError) as e:
+                    print('journal: dropped a torn record at', offset, repr(e))
+                    break
+                offset = f.tell()
+
+        return records, offset
+
+    def replay_journal(self):
+        records, self.journal_offset = self.read_journal()
+        if not records: return
+
+        # read-only storages are replayed into plain tables, compact accents are rebuilt afterwards
+        writable = self.writable
+        self.writable = True
+        if not isinstance(self.accents, dict):
+            self.accents = writable_table('accents', self.accents)
+        for name in TABLES:
+            if name != 'accents' and self.is_loaded(name) and isinstance(self.__dict__[name], CompactTable):
+                self.__dict__[name] = writable_table(name, self.__dict__[name])
+
+        self.journal_depth += 1 # replayed calls are already in the journal
+        failed = []
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i, record in enumerate(records):
+                    name, args, kwargs = record[:3]
+                    raised = None
+                    try:
+                        getattr(self, name)(*args, **kwargs)
+                    except Exception as e:
+                        raised = e
+                    # A call that raised when it was made has made the same changes before raising again.
+                    # Records of old versions don't keep the outcome, their failures are only logged
+                    outcome = type(raised).__name__ if raised is not None else None
+                    if len(record) > 3 and outcome != record[3]:
+                        raise JournalError('record {} {}{}: {} on replay, {} when it was made'.format(
+                            i, name, args, outcome or 'returned', record[3] or 'returned')) from raised
+                    if raised is not None:
+                        failed.append((i, name, args, raised, len(record) > 3))
+        finally:
+            self.journal_depth -= 1
+            self.writable = writable
+
+        for i, name, args, raised, recorded in failed:
+            print('journal: record', i, name, args, 'raised', repr(raised),
+                  'as it did when it was made' if recorded else 'and its outcome was not recorded')
+
+        if self.storage == 'compact' and not writable:
+            self.accents = CompactAccents.from_dict(self.accents)
+        print('journal: replayed', len(records), 'changes')
 
     def save(self):
-        with open(r'accents.pickle', 'wb') as f:
-            pickle.dump(self.accents, f)
-        with open(r'homographs.pickle', 'wb') as f:
-            pickle.dump(self.homographs, f)
-        with open(r'homographs_unresolvable.pickle', 'wb') as f:
-            pickle.dump(self.homographs_unresolvable, f)
+        # appends pending changes to the journal, its torn tail left by a crash is cut off first
+        if not self.pending: return
+
+        journal = self.file_name('journal', '.log')
+        with open(journal, 'ab') as f:
+            if f.tell() != self.journal_offset:
+                f.truncate(self.journal_offset)
+                f.seek(self.journal_offset)
+            f.write(b''.join(self.pending))
+            f.flush()
+            os.fsync(f.fileno())
+            self.journal_offset = f.tell()
+
+        print('journal:', len(self.pending), 'changes saved')
+        self.pending = []
+        self.changed = False
 
-        print(len(self.accents) - self.start_size[0], len(self.homographs) - self.start_size[1], len(self.homographs_unresolvable) - self.start_size[2])
+    def merge_folded(self):
+        # Entries normalize_table dropped: an accent with another position than the kept one
+        # makes the key an unresolvable homograph, homograph entries are merged into the kept ones
+        if not self.dropped: return
+        if not isinstance(self.accents, dict):
+            self.accents = writable_table('accents', self.accents)
+
+        for name, dropped in self.dropped.items():
+            conflicts = 0
+            for key, value in dropped:
+                if name == 'accents':
+                    pos = self.accents.get(key)
+                    if pos is None or pos == value: continue
+                    del self.accents[key]
+                    entry = self.homographs_unresolvable.setdefault(key, [set(), {}])
+                    entry[POS_SET].update((pos, value))
+                    conflicts += 1
+                elif name in ('homographs_old', 'homographs', 'homographs_unresolvable'):
+                    entry = getattr(self, name)[key]
+                    if value[POS_SET] - entry[POS_SET]: conflicts += 1
+                    entry[POS_SET].update(value[POS_SET])
+                    for morph, pos in value[MORPHS].items():
+                        entry[MORPHS].setdefault(morph, pos)
+            print('normalize: merged', len(dropped), name, 'entries,', conflicts, 'with other positions')
+
+        self.dropped = {}
+        self.changed = True
+
+    def compact(self):
+        # folds the journal into the table pickles and empties it,
+        # pickles of old versions are rewritten normalized
+        self.merge_folded()
+        saved = []
+        for name in SAVED_TABLES if self.normalized else TABLES:
+            # a table that was never accessed is unchanged on disk
+            if self.normalized and not self.is_loaded(name): continue
+            if not self.is_loaded(name) and name not in self.table_files: continue
+            table = getattr(self, name)
+            if isinstance(table, CompactTable): table = writable_table(name, table)
+            temp = self.file_name(name, '.tmp')
+            with open(temp, 'wb') as f:
+                pickle.dump(table, f)
+            os.replace(temp, self.file_name(name))
+            saved.append(len(table) - self.start_sizes.get(name, 0))
+
+        if not self.normalized:
+            with open(self.file_name('format'), 'wb') as f:
+                pickle.dump({'normalized': True}, f)
+            self.normalized = True
+
+        # index of the homograph keys as they are on disk now
+        self.write_homograph_keys(self.make_homograph_keys())
+        self.__dict__.pop('homograph_keys', None)
+        self.table_files = self.pin_files()
+
+        if path.exists(self.file_name('journal', '.log')):
+            os.remove(self.file_name('journal', '.log'))
+        self.journal_offset = 0
+        self.pending = []
+        self.changed = False
+
+        print(*saved)
+
+    def compile(self, directory=None):
+        # writes every table as a memory mapped .bin table for storage='mapped'.
+        # The journal is folded first, otherwise every mapped load would replay it into plain dicts
+        self.compact()
+        for name in TABLES:
+            table = getattr(self, name, None)
+            if table is None: continue
+            if isinstance(table, set): table = dict.fromkeys(table)
+
+            if name == 'accents':
+                table = CompactAccents.from_dict(table)
+            else:
+                table = CompactObjects.from_dict(table)
+            table.save(self.file_name(name, '.bin', directory))
+            print('compiled', name, len(table))
 
     def save_if_changed(self):
         if self.changed: self.save()
 
+    @journaled
     def add_accent(self, word: str, pos: int):
         if count_vovels(word) < 2: return
+        word = normalize(word)
 
         if word in self.homographs_unresolvable:
             print('add_accent: word in unresolvable:', word[:pos + 1] + '́' + word[pos + 1:])
@@ -79,8 +514,10 @@ class AccentDictionary:
         self.changed = True
         print('new accent', word[:pos + 1] + '́' + word[pos + 1:])
 
+    @journaled
     def add_homograph(self, word: str, morph: Morph, pos: int):
         if count_vovels(word) < 2: return
+        word = normalize(word)
         self.accents.pop(word, None)
 
         if word in self.homographs_unresolvable:
@@ -114,10 +551,12 @@ class AccentDictionary:
             self.changed = True
             print('new homograph', word[:pos + 1] + '́' + word[pos + 1:], morph)
 
+    @journaled
     def add_homograph_unresolvable(self, word, morph, pos):
         assert morph is not None
 
         if count_vovels(word) < 2: return
+        word = normalize(word)
         self.accents.pop(word, None)
         self.homographs.pop(word, None)
 
@@ -144,11 +583,14 @@ class AccentDictionary:
             self.changed = True
             print('new unresolvable', word[:pos + 1] + '́' + word[pos + 1:], morph)
 
+    @journaled
     def clean_homographs(self):
-        for k in list(self.homographs):
+        words = list(self.homographs)
+        for k, vovels_count in zip(words, count_vovels_batch(words)):
             if len(self.homographs[k][POS_SET]) == 1:
                 data = self.homographs.pop(k)
-                if count_vovels(k) > 1:
+                self.changed = True
+                if vovels_count > 1:
                     self.add_accent(k, list(data[0])[0])
 
     def move_to_unresolvable(self, word):
@@ -165,106 +607,125 @@ skip_words = ['асессоров', 'поатласнее', 'поатласне
 not_found_words_h = []
 prefixes = ['авто', 'агит', 'по']
 
-if __name__ == "__main__":
-    dictionary = AccentDictionary()
-    dictionary.load()
 
-    morpher = pymorphy2.MorphAnalyzer()
+class WordNotFound(Exception):
+    pass
 
-    skip = True
 
-    for word in dictionary.homographs_old:
-        if skip:
-            if word == 'багрящего':
-                skip = False
-            else:
-                continue
+def has_form(variants, word):
+    for variant in variants:
+        for word_var in variant[0]:
+            if word_var.replace('́', '') == word:
+                return True
+    return False
 
-        if word in skip_words:
-            continue
-        # word = 'стоит'
-        print(word)
-        variants = parse_wikt_ru(word)
-        prefix = None
-
-        if len(variants) == 0:
-            if not(word in dictionary.homographs or word in dictionary.homographs_unresolvable or word in bad_words_h or word in not_found_words_h):
-                parse = morpher.parse(word)[0]
-                normal_word = parse.normal_form
-                print('normal_form', normal_word, word)
-                variants = parse_wikt_ru(normal_word)
-
-                fl = False
-
-                for variant in variants:
-                    for word_var in variant[0]:
-                        if word_var.replace('́', '') == word:
-                            fl = True
-                            break
-                    if fl: break
-
-                if not fl and parse.tag.POS == 'PRTF':
-                    # no variants for prtf in 'прич ru'
-                    print('Not found, continue', word)
-                    continue
-
-                if not fl:
-                    match = re.match(r'|'.join(prefixes), word)
-                    variants = []
-
-                    if match:
-                        prefix = match.group()
-                        word = word[match.end():match.endpos]
-                        print('приставка', prefix, word)
-                        variants = parse_wikt_ru(word)
-
-                        if len(variants) == 0:
-                            parse = morpher.parse(word)
-                            normal_word = parse[0].normal_form
-                            print('normal_form', normal_word, word)
-                            variants = parse_wikt_ru(normal_word)
-
-                            fl = False
-
-                            for variant in variants:
-                                for word_var in variant[0]:
-                                    if word_var.replace('́', '') == word:
-                                        fl = True
-                                        break
-
-                            if not fl:
-                                print('Not found', word)
-                                raise Exception()
-                    else:
-                        print('Not found', word)
-                        raise Exception()
 
+def find_variants(word, dictionary, morpher):
+    # wiktionary variants of a homograph word: from its own page, else from the page of its normal form,
+    # else from the pages of the word without a known prefix, with the prefix put back.
+    # Only reads the dictionary's homographs and homographs_unresolvable, raises WordNotFound
+    print(word)
+    variants = parse_wikt_ru(word)
+    prefix = None
 
-            else:
-                print('Not found, word in dict', word)
+    if len(variants) == 0:
+        if not(word in dictionary.homographs or word in dictionary.homographs_unresolvable or word in bad_words_h or word in not_found_words_h):
+            parse = morpher.parse(word)[0]
+            normal_word = parse.normal_form
+            print('normal_form', normal_word, word)
+            variants = parse_wikt_ru(normal_word)
 
-        if prefix is not None:
-            for variant in variants:
-                variant[1] = prefix + variant[1]
-                for i, word_var in enumerate(variant[0]):
-                    variant[0][i] = prefix + word_var
+            fl = has_form(variants, word)
 
-        for variant in variants:
-            for word_var in variant[0]:
-                if 'ё' in word_var: continue
+            if not fl and parse.tag.POS == 'PRTF':
+                # no variants for prtf in 'прич ru'
+                print('Not found, continue', word)
+                return []
+
+            if not fl:
+                match = re.match(r'|'.join(prefixes), word)
+                variants = []
 
-                morph = Morph()
-                morph.set_base(variant[1])
-                morph.fill_tags_from_variant(variant)
+                if match:
+                    prefix = match.group()
+                    word = word[match.end():match.endpos]
+                    print('приставка', prefix, word)
+                    variants = parse_wikt_ru(word)
 
-                word_t = word_var.replace('́', '')
-                if '́' in word_var:
-                    pos_t = word_var.index('́') - 1
+                    if len(variants) == 0:
+                        parse = morpher.parse(word)
+                        normal_word = parse[0].normal_form
+                        print('normal_form', normal_word, word)
+                        variants = parse_wikt_ru(normal_word)
+
+                        if not has_form(variants, word):
+                            print('Not found', word)
+                            raise WordNotFound(word)
                 else:
-                    raise Exception()
+                    print('Not found', word)
+                    raise WordNotFound(word)
+
+        else:
+            print('Not found, word in dict', word)
+
+    if prefix is not None:
+        for variant in variants:
+            variant[1] = prefix + variant[1]
+            for i, word_var in enumerate(variant[0]):
+                variant[0][i] = prefix + word_var
+
+    return variants
+
+
+def apply_variants(dictionary, variants):
+    # every accented form of the variants becomes a homograph form
+    for variant in variants:
+        for word_var in variant[0]:
+            if 'ё' in word_var: continue
+
+            morph = Morph()
+            morph.set_base(variant[1])
+            morph.fill_tags_from_variant(variant)
+
+            word_t = word_var.replace('́', '')
+            if '́' in word_var:
+                pos_t = word_var.index('́') - 1
+            else:
+                raise Exception()
+
+            dictionary.add_homograph(word_t, morph, pos_t)
 
-                dictionary.add_homograph(word_t, morph, pos_t)
-                pass
 
-    # dictionary.save()
+if __name__ == "__main__":
+    # python dictionary.py [multistream dump] reads wiktionary pages from the local dump instead of the API
+    if len(sys.argv) > 1:
+        use_local_dump(sys.argv[1])
+    # API responses are reused by restarted builds
+    use_api_cache()
+
+    dictionary = AccentDictionary()
+    dictionary.load()
+
+    morpher = CachedMorphAnalyzer()
+
+    # the build resumes after the last word it finished, words whose lookup failed are retried first.
+    # crawler.py does the same with many lookups in flight
+    checkpoint = Checkpoint(dictionary.file_name('build_checkpoint'))
+    checkpoint.load()
+    checkpoint.check_journal(dictionary.journal_offset)
+
+    for word in checkpoint.resume(dictionary.homographs_old, dictionary, interval=5):
+        if word in skip_words:
+            continue
+        # word = 'стоит'
+        try:
+            variants = find_variants(word, dictionary, morpher)
+        except RequestException as e:
+            print('lookup failed, retrying on the next run', word, repr(e))
+            checkpoint.defer(word)
+            continue
+
+        apply_variants(dictionary, variants)
 
+    print('paradigm cache:', paradigm_cache.stats())
+    # dictionary.compact()
@@ -0,0 +1,142 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# api.php of a wiki, {} is the language. Point it to a local stub server for tests
+API_URL = os.environ.get('WIKTIONARY_API_URL', 'https://{}.wiktionary.org/w/api.php')
+MAX_TITLES = 50 # titles per query, the API limit for clients without apihighlimits
+MAX_EXPAND_CHARS = 6000 # template text per expandtemplates call
+SPLIT_MARKER = '\n\nACCENTIZER-SPLIT-8f3a\n\n' # plain text, passes template expansion unchanged
+TIMEOUT = 60
+
+local = threading.local()
+
+
+def session():
+    # keep-alive session of this thread, forked processes make their own
+    if getattr(local, 'pid', None) != os.getpid():
+        local.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=3)
+        local.session.mount('https://', adapter)
+        local.session.mount('http://', adapter)
+        local.pid = os.getpid()
+    return local.session
+
+
+def api_url(language='ru'):
+    return API_URL.format(language)
+
+
+def api_get(params, language='ru'):
+    resp = session().get(api_url(language), params=params, timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def api_post(params, language='ru'):
+    resp = session().post(api_url(language), data=params, timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def resolve_titles(query, titles):
+    # requested title -> title of the page returned for it, through normalization, then redirects
+    targets = {title: title for title in titles}
+    for step in ('normalized', 'redirects'):
+        renames = {n['from']: n['to'] for n in query.get(step, [])}
+        for title, target in targets.items():
+            targets[title] = renames.get(target, target)
+    return targets
+
+
+def fetch_pages(titles, language='ru') -> Dict[str, Tuple[str, int, str]]:
+    # {requested title: (wikitext, revision id, title of the page)} in one query per MAX_TITLES titles.
+    # Redirects and title normalization are resolved by the API, missing pages are ('', 0, title)
+    result = {}
+    titles = list(dict.fromkeys(titles))
+
+    for i in range(0, len(titles), MAX_TITLES):
+        batch = titles[i:i + MAX_TITLES]
+        resp = api_get({
+            'action': 'query',
+            'titles': '|'.join(batch),
+            'redirects': 1,
+            'prop': 'revisions',
+            'rvprop': 'content|ids',
+            'format': 'json',
+        }, language)
+
+        query = resp['query']
+        targets = resolve_titles(query, batch)
+        pages = {}
+        for page in query['pages'].values():
+            if 'revisions' in page:
+                pages[page['title']] = (page['revisions'][0]['*'], page['revisions'][0]['revid'], page['title'])
+            else:
+                pages[page['title']] = ('', 0, page['title'])
+
+        for title, target in targets.items():
+            result[title] = pages.get(target, ('', 0, target))
+
+    return result
+
+
+def fetch_revisions(titles, language='ru') -> Dict[str, int]:
+    # {requested title: current revision id of its page, 0 if missing}, MAX_TITLES titles per query
+    result = {}
+    titles = list(dict.fromkeys(titles))
+
+    for i in range(0, len(titles), MAX_TITLES):
+        batch = titles[i:i + MAX_TITLES]
+        query = api_get({
+            'action': 'query',
+            'titles': '|'.join(batch),
+            'redirects': 1,
+            'prop': 'info',
+            'format': 'json',
+        }, language)['query']
+
+        revisions = {page['title']: page.get('lastrevid', 0) for page in query['pages'].values()}
+        for title, target in resolve_titles(query, batch).items():
+            result[title] = revisions.get(target, 0)
+
+    return result
+
+
+def expand_batches(texts):
+    # groups of texts of at most MAX_EXPAND_CHARS, a longer text makes a group of its own
+    batch, size = [], 0
+    for text in texts:
+        if batch and size + len(text) > MAX_EXPAND_CHARS:
+            yield batch
+            batch, size = [], 0
+        batch.append(text)
+        size += len(text) + len(SPLIT_MARKER)
+    if batch:
+        yield batch
+
+
+def expand_templates(texts, language='ru') -> List[str]:
+    # expanded wikitext of every text, several texts per call joined by SPLIT_MARKER.
+    # A batch whose output doesn't split back into as many parts is expanded text by text
+    result = []
+    for batch in expand_batches(texts):
+        resp = api_post({
+            'action': 'expandtemplates',
+            'text': SPLIT_MARKER.join(batch),
+            'prop': 'wikitext',
+            'format': 'json',
+        }, language)
+        parts = resp['expandtemplates']['wikitext'].split(SPLIT_MARKER)
+
+        if len(parts) == len(batch):
+            result += parts
+        elif len(batch) > 1:
+            result += [expand_templates([text], language)[0] for text in batch]
+        else:
+            result += [resp['expandtemplates']['wikitext']]
+
+    return result
@@ -0,0 +1,99 @@
+from bisect import bisect_left
+from typing import Dict
+
+# lookup outcomes of a token
+OUTCOMES = ('hit', 'miss', 'predicted', 'homograph_resolved', 'homograph_unresolved', 'unresolvable',
+            'single_vowel', 'accented', 'no_vowel')
+# histogram bucket upper bounds, seconds
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        # (upper bound, observations not above it) pairs, the last bound is +Inf
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def snapshot(self):
+        return {'buckets': {('+Inf' if b == float('inf') else repr(b)): c for b, c in self.cumulative()},
+                'sum': self.sum, 'count': self.count}
+
+
+class Metrics:
+    # Opt-in counters and latencies of an Accentizer: Accentizer(metrics=Metrics()).
+    # Stages: 'lookup' (a get_accent lookup), 'homograph' (a resolution), 'batch' (an accentize_batch call).
+    # load_seconds is the dictionary's {table name: load time} and is filled as tables get loaded.
+
+    def __init__(self):
+        self.counters: Dict[str, int] = dict.fromkeys(OUTCOMES, 0)
+        self.histograms: Dict[str, Histogram] = {}
+        self.load_seconds: Dict[str, float] = {}
+
+    def count(self, outcome, n=1):
+        self.counters[outcome] += n
+
+    def observe(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def reset(self):
+        self.counters = dict.fromkeys(OUTCOMES, 0)
+        self.histograms = {}
+
+    def merge(self, other):
+        # adds counts and latencies of other, e.g. of a worker process; load times are of this process
+        for outcome, count in other.counters.items():
+            self.counters[outcome] += count
+        for stage, other_histogram in other.histograms.items():
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(other_histogram.buckets)
+            histogram.merge(other_histogram)
+
+    def snapshot(self):
+        return {'tokens': dict(self.counters),
+                'stages': {stage: h.snapshot() for stage, h in self.histograms.items()},
+                'load_seconds': dict(self.load_seconds)}
+
+    def to_prometheus(self, prefix='accentizer'):
+        lines = ['# TYPE {}_tokens_total counter'.format(prefix)]
+        for outcome, count in self.counters.items():
+            lines.append('{}_tokens_total{{outcome="{}"}} {}'.format(prefix, outcome, count))
+
+        lines.append('# TYPE {}_stage_seconds histogram'.format(prefix))
+        for stage, histogram in self.histograms.items():
+            for bound, count in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(prefix, stage, le, count))
+            lines.append('{}_stage_seconds_sum{{stage="{}"}} {}'.format(prefix, stage, repr(histogram.sum)))
+            lines.append('{}_stage_seconds_count{{stage="{}"}} {}'.format(prefix, stage, histogram.count))
+
+        lines.append('# TYPE {}_table_load_seconds gauge'.format(prefix))
+        for table, seconds in self.load_seconds.items():
+            lines.append('{}_table_load_seconds{{table="{}"}} {}'.format(prefix, table, repr(seconds)))
+
+        return '\n'.join(lines) + '\n'
@@ -31,6 +31,13 @@ class Morph:
         self.universaldependencies_tags = UniversaldependenciesTags()
         self.universaldependencies_tags.from_variant(variant[3])
 
+    def fill_tags_from_pymorphy(self, parse):
+        # universal dependencies tags are left empty
+        self.set_base(parse.normal_form)
+
+        self.opencorpora_tags = OpencorporaTags()
+        self.opencorpora_tags.from_pymorphy(parse.tag)
+
     def fill_tags_from_string(self, str):
         splits = morph.split()
         tags = None
@@ -170,6 +177,7 @@ class OpencorporaTags(BaseTags):
     TENSE = ('pres', 'past', 'futr')
     PERSON = ('1per', '2per', '3per')
     MOOD = ('indc', 'impr')
+    PYMORPHY_CASES = {'gen1': 'gent', 'acc2': 'accs', 'loc1': 'loct'}
 
     def __init__(self):
         BaseTags.__init__(self)
@@ -182,6 +190,20 @@ class OpencorporaTags(BaseTags):
                 assert g in self.POS_G
                 self.pos_grammeme.add(g)
 
+    def from_pymorphy(self, tag):
+        # tag.POS must be in POS, grammemes that have no place here are skipped
+        self.set_pos(tag.POS)
+
+        case = self.PYMORPHY_CASES.get(tag.case, tag.case)
+        tags = (('Animacy', tag.animacy, self.ANIMACY), ('Case', case, self.CASE), ('Gender', tag.gender, self.GENDER),
+                ('Number', tag.number, self.NUMBER), ('Tense', tag.tense, self.TENSE),
+                ('Person', tag.person, self.PERSON), ('Mood', tag.mood, self.MOOD))
+        self.set_tags({name: value for name, value, values in tags if value in values})
+
+        for g in self.POS_G:
+            if g in tag:
+                self.pos_grammeme.add(g)
+
     def __str__(self):
         return self.pos + ''.join([',' + x for x in self.pos_grammeme])\
                + ' ' + '|'.join(['='.join(x) for x in self.tags.items()])
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+import pymorphy2
+
+from morph import Morph, OpencorporaTags
+
+POLICIES = ('lru', 'fifo')
+
+
+class BoundedCache:
+    # 'lru' evicts the least recently used entry, 'fifo' the oldest inserted one.
+    # Shared by threads: the lock guards the entries, compute runs outside it
+    def __init__(self, maxsize=100000, policy='lru'):
+        assert policy in POLICIES
+        self.maxsize = maxsize
+        self.policy = policy
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        # cached value for key, compute(key) is called on a miss
+        data = self.data
+        with self.lock:
+            if key in data:
+                self.hits += 1
+                if self.policy == 'lru':
+                    data.move_to_end(key)
+                return data[key]
+            self.misses += 1
+
+        # threads missing the same key at once compute it each, the last one is kept
+        value = compute(key)
+        with self.lock:
+            data[key] = value
+            if len(data) > self.maxsize:
+                data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {'size': len(self.data), 'maxsize': self.maxsize, 'policy': self.policy,
+                'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / calls if calls > 0 else 0.0}
+
+
+def parse_to_morph(parse):
+    if parse.tag.POS not in OpencorporaTags.POS:
+        return None
+    morph = Morph()
+    morph.fill_tags_from_pymorphy(parse)
+    return morph
+
+
+class CachedMorphAnalyzer:
+    # pymorphy2.MorphAnalyzer with cached parse() results and their Morph conversions.
+    # Cached lists and Morphs are shared between callers and must not be modified.
+    def __init__(self, morpher=None, maxsize=100000, policy='lru'):
+        self.morpher = morpher if morpher is not None else pymorphy2.MorphAnalyzer()
+        self.parses = BoundedCache(maxsize, policy)
+        self.morphs = BoundedCache(maxsize, policy)
+
+    def parse(self, word):
+        return self.parses.get(word, self.morpher.parse)
+
+    def morph(self, parse):
+        # Morph of a parse, None for parts of speech OpencorporaTags doesn't know
+        return self.morphs.get(parse, parse_to_morph)
+
+    def stats(self):
+        return {'parse': self.parses.stats(), 'morph': self.morphs.stats()}
+
+    def __getattr__(self, name):
+        # the rest of the MorphAnalyzer interface
+        return getattr(self.morpher, name)
@@ -0,0 +1,216 @@
+import threading
+
+from paradigms import stress_index, stressed, unstressed, vowel_positions
+from wikt_template_parser import clean_comments
+
+# Templates whose tables are cached by paradigm, and arguments that are the lemma's own, not its paradigm's.
+# Of the verb's aspect partner соотв only its presence is the paradigm's, it decides the aspect tags
+PARADIGM_TEMPLATES = ('сущ ru', 'прил ru', 'гл ru')
+LEMMA_ARGUMENTS = {'основа', 'основа1', 'основа2', 'основа3', 'основа4', 'слоги', 'степень'}
+PRESENCE_ARGUMENTS = {'соотв'}
+
+UNCACHEABLE = 'uncacheable' # shape of a paradigm whose lemmas don't share one
+
+
+def copy_tag(tag):
+    # {'tag': {}, 'pos-grammeme': set(), ...} copy without copy.deepcopy
+    return {k: v.copy() if isinstance(v, (dict, set)) else v for k, v in tag.items()}
+
+
+def common_prefix(words):
+    prefix = words[0]
+    for word in words[1:]:
+        i = 0
+        while i < len(prefix) and i < len(word) and prefix[i] == word[i]:
+            i += 1
+        prefix = prefix[:i]
+    return prefix
+
+
+def stem_positions(stem, headword, base):
+    # stressed stem vowel of each kind: 'S' as in the headword, 'L' the last one, 'F' the first one
+    stem_vowels = vowel_positions(stem)
+    positions = {'L': stem_vowels[-1], 'F': stem_vowels[0]}
+    i = stress_index(headword) if unstressed(headword) == base else None
+    if i is not None and i < len(stem):
+        positions['S'] = i
+    return positions
+
+
+class ParadigmCache:
+    # Parsed tables by paradigm: template name and arguments without the lemma's own ones.
+    # A shape keeps every cell's endings and tags, the stress of a form as an offset into its ending
+    # or as the set of stem stress kinds ('S', 'L', 'F') it agreed with in all lemmas seen so far.
+    # A lemma of a known paradigm is made by putting its stem in front of the endings; when the kinds
+    # of a form point to different vowels of the new stem the table is parsed and the kinds are narrowed.
+
+    def __init__(self):
+        self.shapes = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def key(self, template):
+        # None for templates that aren't cached
+        name = template.name.strip()
+        if not any(t in name for t in PARADIGM_TEMPLATES):
+            return None
+        arguments = []
+        for argument in template.arguments:
+            argument_name = argument.name.strip()
+            if argument_name in LEMMA_ARGUMENTS: continue
+            value = argument.value.strip()
+            if argument_name in PRESENCE_ARGUMENTS:
+                value = '1' if clean_comments(value) else ''
+            arguments.append((argument_name, value))
+        return name, tuple(sorted(arguments))
+
+    @staticmethod
+    def stem(shape, base):
+        # stem of the lemma in the paradigm's shape, None if the shape can't make its table
+        lemma_ending = shape[0]
+        stem = base[:len(base) - len(lemma_ending)]
+        if not base.endswith(lemma_ending) or 'ё' in stem or not vowel_positions(stem):
+            return None
+        return stem
+
+    def covers(self, key, base):
+        # True if the lemma's table will most likely be made from its paradigm's shape, so it needn't be expanded.
+        # get() still misses when the stress kinds of a form point to different vowels of the stem
+        shape = self.shapes.get(key)
+        return shape is not None and shape != UNCACHEABLE and self.stem(shape, base) is not None
+
+    def get(self, key, word_acc, base):
+        # variants of the lemma made from its paradigm's shape, None on a miss
+        shape = self.shapes.get(key)
+        if shape is None:
+            self.misses += 1
+            return None
+        if shape == UNCACHEABLE:
+            self.uncacheable += 1
+            return None
+
+        cells = shape[1]
+        stem = self.stem(shape, base)
+        if stem is None:
+            self.uncacheable += 1
+            return None
+        positions = stem_positions(stem, word_acc[0], base)
+
+        variants = []
+        for forms, opencorpora_tag, universalD_tag in cells:
+            words = None
+            if forms is not None:
+                words = []
+                for ending, stress in forms:
+                    if stress is None:
+                        words.append(stem + ending)
+                    elif isinstance(stress, int):
+                        words.append(stem + stressed(ending, stress))
+                    else:
+                        found = {positions.get(kind) for kind in stress}
+                        if len(found) != 1 or None in found:
+                            self.misses += 1
+                            return None
+                        words.append(stressed(stem, found.pop()) + ending)
+            variants.append([words, base, copy_tag(opencorpora_tag), copy_tag(universalD_tag)])
+
+        self.hits += 1
+        return variants
+
+    def learn(self, key, word_acc, base, variants):
+        # adds the shape of a parsed table, or narrows the shape of its paradigm
+        shape = self.make_shape(word_acc, base, variants)
+        if shape is None:
+            return
+        with self.lock:
+            known = self.shapes.get(key)
+            if known is None:
+                self.shapes[key] = shape
+            elif known != UNCACHEABLE:
+                self.shapes[key] = self.merge_shapes(known, shape)
+
+    def make_shape(self, word_acc, base, variants):
+        # (lemma ending, cells) of the table, None if its forms don't share the base's stem
+        if base is None or any(variant[1] != base for variant in variants):
+            return None
+        forms = [unstressed(word) for variant in variants if variant[0] is not None for word in variant[0]]
+        stem = common_prefix([base] + forms)
+        if 'ё' in stem or not vowel_positions(stem):
+            return None
+        positions = stem_positions(stem, word_acc[0], base)
+
+        cells = []
+        for words, _, opencorpora_tag, universalD_tag in variants:
+            forms = None
+            if words is not None:
+                forms = []
+                for word in words:
+                    i = stress_index(word)
+                    plain = unstressed(word)
+                    if i is None:
+                        stress = None
+                    elif i >= len(stem):
+                        stress = i - len(stem)
+                    else:
+                        stress = frozenset(kind for kind, position in positions.items() if position == i)
+                        if not stress:
+                            return None
+                    forms.append((plain[len(stem):], stress))
+                forms = tuple(forms)
+            cells.append((forms, copy_tag(opencorpora_tag), copy_tag(universalD_tag)))
+
+        return base[len(stem):], cells
+
+    @staticmethod
+    def merge_shapes(known, shape):
+        # known shape with stress kinds narrowed by another lemma's, UNCACHEABLE if they differ otherwise
+        if known[0] != shape[0] or len(known[1]) != len(shape[1]):
+            return UNCACHEABLE
+
+        cells = []
+        for (forms, opencorpora_tag, universalD_tag), (other_forms, *other_tags) in zip(known[1], shape[1]):
+            if [opencorpora_tag, universalD_tag] != other_tags:
+                return UNCACHEABLE
+            if forms is None or other_forms is None:
+                if forms is not other_forms:
+                    return UNCACHEABLE
+                cells.append((forms, opencorpora_tag, universalD_tag))
+                continue
+            if len(forms) != len(other_forms):
+                return UNCACHEABLE
+
+            merged = []
+            for (ending, stress), (other_ending, other_stress) in zip(forms, other_forms):
+                if ending != other_ending:
+                    return UNCACHEABLE
+                if isinstance(stress, frozenset) and isinstance(other_stress, frozenset):
+                    stress = stress & other_stress
+                    if not stress:
+                        return UNCACHEABLE
+                elif stress != other_stress:
+                    return UNCACHEABLE
+                merged.append((ending, stress))
+            cells.append((tuple(merged), opencorpora_tag, universalD_tag))
+
+        return known[0], cells
+
+    def stats(self):
+        calls = self.hits + self.misses + self.uncacheable
+        return {'paradigms': len(self.shapes), 'hits': self.hits, 'misses': self.misses,
+                'uncacheable': self.uncacheable, 'hit_rate': self.hits / calls if calls > 0 else 0.0}
+
+
+def merge_stats(stats):
+    # totals of stats() of several processes
+    total = {'paradigms': 0, 'hits': 0, 'misses': 0, 'uncacheable': 0}
+    for s in stats:
+        for k in total:
+            total[k] += s[k]
+    calls = total['hits'] + total['misses'] + total['uncacheable']
+    total['hit_rate'] = total['hits'] / calls if calls > 0 else 0.0
+    return total
+
+
+paradigm_cache = ParadigmCache() # of this process, worker processes of wikt_dump have their own
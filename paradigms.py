@@ -0,0 +1,334 @@
+import copy
+import re
+
+from wikt_template_parser import r_anim_opencorpora, r_anim_universalD, r_case_opencorpora, r_case_universalD, \
+    r_gender_opencorpora, r_gender_universalD, r_number_opencorpora, r_number_universalD
+
+# Local declension of 'сущ ru' and 'прил ru' templates by Zaliznyak's index, without expandtemplates.
+# Supported are nouns of types 1-8 with stress schemes a-f and adjectives 1a, 1b, 2a, 3a, 3b, 4a, 4b;
+# indices with *, primes, circled numbers or alternatives, and templates with arguments that change the table,
+# are left to the remote expansion: the functions return None for them.
+
+STRESS = '́'
+vowels = 'аеёиоуыэюяАЕЁИОУЫЭЮЯ'
+hissing = 'жшчщ'
+
+CASES = ('им.', 'род.', 'дат.', 'вин.', 'твор.', 'пр.')
+NUMBERS = ('ед', 'мн')
+
+# template arguments that don't change the declension table
+TABLE_NEUTRAL = {'основа', 'основа1', 'слоги', 'hide-text'}
+
+# Noun endings by (type, gender): singular then plural in CASES order, None for an accusative that
+# follows animacy, (unstressed, stressed) pairs for endings spelled differently under stress
+NOUN_ENDINGS = {
+    (1, 'm'): ('', 'а', 'у', None, 'ом', 'е', 'ы', 'ов', 'ам', None, 'ами', 'ах'),
+    (2, 'm'): ('ь', 'я', 'ю', None, ('ем', 'ём'), 'е', 'и', 'ей', 'ям', None, 'ями', 'ях'),
+    (3, 'm'): ('', 'а', 'у', None, 'ом', 'е', 'и', 'ов', 'ам', None, 'ами', 'ах'),
+    (4, 'm'): ('', 'а', 'у', None, ('ем', 'ом'), 'е', 'и', 'ей', 'ам', None, 'ами', 'ах'),
+    (5, 'm'): ('', 'а', 'у', None, ('ем', 'ом'), 'е', 'ы', ('ев', 'ов'), 'ам', None, 'ами', 'ах'),
+    (6, 'm'): ('й', 'я', 'ю', None, ('ем', 'ём'), 'е', 'и', ('ев', 'ёв'), 'ям', None, 'ями', 'ях'),
+    (7, 'm'): ('й', 'я', 'ю', None, 'ем', 'и', 'и', 'ев', 'ям', None, 'ями', 'ях'),
+    (1, 'f'): ('а', 'ы', 'е', 'у', 'ой', 'е', 'ы', '', 'ам', None, 'ами', 'ах'),
+    (2, 'f'): ('я', 'и', 'е', 'ю', ('ей', 'ёй'), 'е', 'и', ('ь', 'ей'), 'ям', None, 'ями', 'ях'),
+    (3, 'f'): ('а', 'и', 'е', 'у', 'ой', 'е', 'и', '', 'ам', None, 'ами', 'ах'),
+    (4, 'f'): ('а', 'и', 'е', 'у', ('ей', 'ой'), 'е', 'и', '', 'ам', None, 'ами', 'ах'),
+    (5, 'f'): ('а', 'ы', 'е', 'у', ('ей', 'ой'), 'е', 'ы', '', 'ам', None, 'ами', 'ах'),
+    (6, 'f'): ('я', 'и', 'е', 'ю', ('ей', 'ёй'), 'е', 'и', 'й', 'ям', None, 'ями', 'ях'),
+    (7, 'f'): ('я', 'и', 'и', 'ю', 'ей', 'и', 'и', 'й', 'ям', None, 'ями', 'ях'),
+    (8, 'f'): ('ь', 'и', 'и', 'ь', 'ью', 'и', 'и', 'ей', 'ям', None, 'ями', 'ях'),
+    (1, 'n'): ('о', 'а', 'у', None, 'ом', 'е', 'а', '', 'ам', None, 'ами', 'ах'),
+    (2, 'n'): (('е', 'ё'), 'я', 'ю', None, ('ем', 'ём'), 'е', 'я', 'ей', 'ям', None, 'ями', 'ях'),
+    (3, 'n'): ('о', 'а', 'у', None, 'ом', 'е', 'а', '', 'ам', None, 'ами', 'ах'),
+    (4, 'n'): (('е', 'о'), 'а', 'у', None, ('ем', 'ом'), 'е', 'а', '', 'ам', None, 'ами', 'ах'),
+    (5, 'n'): (('е', 'о'), 'а', 'у', None, ('ем', 'ом'), 'е', 'а', '', 'ам', None, 'ами', 'ах'),
+    (7, 'n'): ('е', 'я', 'ю', None, 'ем', 'и', 'я', 'й', 'ям', None, 'ями', 'ях'),
+}
+
+# Adjective endings by type and column: им., род., дат., вин. animate, вин. inanimate, твор., пр.,
+# then the short form
+ADJECTIVE_ENDINGS = {
+    1: {'m': (('ый', 'ой'), 'ого', 'ому', 'ого', ('ый', 'ой'), 'ым', 'ом', ''),
+        'n': ('ое', 'ого', 'ому', 'ое', 'ое', 'ым', 'ом', 'о'),
+        'f': ('ая', 'ой', 'ой', 'ую', 'ую', 'ой', 'ой', 'а'),
+        'p': ('ые', 'ых', 'ым', 'ых', 'ые', 'ыми', 'ых', 'ы')},
+    2: {'m': ('ий', 'его', 'ему', 'его', 'ий', 'им', 'ем', 'ь'),
+        'n': ('ее', 'его', 'ему', 'ее', 'ее', 'им', 'ем', 'е'),
+        'f': ('яя', 'ей', 'ей', 'юю', 'юю', 'ей', 'ей', 'я'),
+        'p': ('ие', 'их', 'им', 'их', 'ие', 'ими', 'их', 'и')},
+    3: {'m': (('ий', 'ой'), 'ого', 'ому', 'ого', ('ий', 'ой'), 'им', 'ом', ''),
+        'n': ('ое', 'ого', 'ому', 'ое', 'ое', 'им', 'ом', 'о'),
+        'f': ('ая', 'ой', 'ой', 'ую', 'ую', 'ой', 'ой', 'а'),
+        'p': ('ие', 'их', 'им', 'их', 'ие', 'ими', 'их', 'и')},
+    4: {'m': (('ий', 'ой'), ('его', 'ого'), ('ему', 'ому'), ('его', 'ого'), ('ий', 'ой'), 'им', ('ем', 'ом'), ''),
+        'n': (('ее', 'ое'), ('его', 'ого'), ('ему', 'ому'), ('ее', 'ое'), ('ее', 'ое'), 'им', ('ем', 'ом'), ('е', 'о')),
+        'f': ('ая', ('ей', 'ой'), ('ей', 'ой'), 'ую', 'ую', ('ей', 'ой'), ('ей', 'ой'), 'а'),
+        'p': ('ие', 'их', 'им', 'их', 'ие', 'ими', 'их', 'и')},
+}
+ADJECTIVE_INDICES = {'1a', '1b', '2a', '3a', '3b', '4a', '4b'}
+ADJECTIVE_ROWS = ('им.', 'род.', 'дат.', 'вин.', 'вин.', 'твор.', 'пр.')
+ADJECTIVE_COLUMNS = (('m', 'ед', 'м'), ('n', 'ед', 'с'), ('f', 'ед', 'ж'), ('p', 'мн', None))
+
+
+def vowel_positions(word):
+    return [i for i, c in enumerate(word) if c in vowels]
+
+
+def stressed(word, i):
+    # word with the stress mark after its i-th letter, ё carries the stress itself
+    if i is None or word[i] in 'ёЁ':
+        return word
+    return word[:i + 1] + STRESS + word[i + 1:]
+
+
+def unstressed(word):
+    return word.replace(STRESS, '')
+
+
+def stress_index(word):
+    # index of the stressed vowel of a marked word, None if it is unmarked
+    if STRESS in word:
+        return word.index(STRESS) - 1
+    positions = [i for i, c in enumerate(word) if c in 'ёЁ']
+    return positions[0] if positions else None
+
+
+def make_form(stem, stem_stress, ending, on_ending):
+    # stem + ending with the stress on the first vowel of the ending or on the stem;
+    # a stressed ending without vowels moves the stress to the last stem vowel
+    if isinstance(ending, tuple):
+        ending = ending[1] if on_ending else ending[0]
+
+    if on_ending:
+        ending_vowels = vowel_positions(ending)
+        if ending_vowels:
+            return stem + stressed(ending, ending_vowels[0])
+        stem_vowels = vowel_positions(stem)
+        return stressed(stem, stem_vowels[-1] if stem_vowels else None) + ending
+
+    return stressed(stem, stem_stress) + ending
+
+
+def template_arguments(template):
+    # {name: value} of the template's named arguments, None if it has positional ones
+    arguments = {}
+    for argument in template.arguments:
+        if argument.positional:
+            return None
+        value = re.sub(r'<!--.*-->', '', argument.value).strip()
+        arguments[argument.name.strip()] = value
+    return arguments
+
+
+def stem_stress_for(stem, marked_stem, headword, scheme, headword_stem_stressed):
+    # stressed vowel of the stem in stem-stressed forms
+    if marked_stem is not None and stress_index(marked_stem) is not None:
+        return stress_index(marked_stem)
+    stem_vowels = vowel_positions(stem)
+    if not stem_vowels:
+        return None
+    if headword_stem_stressed:
+        i = stress_index(headword)
+        if i is not None and i < len(stem):
+            return i
+        if i is None and len(vowel_positions(unstressed(headword))) == 1:
+            return stem_vowels[-1]
+        return None
+    return stem_vowels[0] if scheme == 'f' else stem_vowels[-1]
+
+
+def matches_headword(form, headword):
+    # generated form against the page's word, an unmarked headword is compared without stress
+    if STRESS not in headword and 'ё' not in headword:
+        return unstressed(form) == headword
+    return form == headword
+
+
+def noun_index(template):
+    # (type, scheme, gender, animacy) of a supported 'сущ ru' template, None otherwise
+    parts = template.name.strip().split()
+    if len(parts) != 5 or parts[:2] != ['сущ', 'ru']:
+        return None
+    gender, animacy, index = parts[2:]
+    match = re.fullmatch(r'([1-8])([a-f])', index)
+    if match is None or gender not in ('m', 'f', 'n') or animacy not in ('a', 'ina'):
+        return None
+    decl_type, scheme = int(match.group(1)), match.group(2)
+    if (decl_type, gender) not in NOUN_ENDINGS:
+        return None
+    return decl_type, scheme, gender, animacy
+
+
+def noun_on_ending(scheme, number, case, animacy):
+    if scheme == 'a': return False
+    if scheme == 'b': return True
+    if scheme == 'c': return number == 1
+    if scheme == 'd': return number == 0
+    nominative = case == 0 or (case == 3 and animacy == 'ina')
+    if scheme == 'e': return number == 1 and not nominative
+    if scheme == 'f': return number == 0 or not nominative
+
+
+def noun_forms(headword, arguments, decl_type, scheme, gender, animacy):
+    # [[form] per case] for singular and plural, None if the stem doesn't give the headword
+    endings = NOUN_ENDINGS[(decl_type, gender)]
+
+    nominative = endings[0][0] if isinstance(endings[0], tuple) else endings[0]
+    headword_stem_stressed = not noun_on_ending(scheme, 0, 0, animacy) or not vowel_positions(nominative)
+    plain = unstressed(headword)
+
+    marked_stem = arguments.get('основа') or None
+    if marked_stem is not None:
+        stem = unstressed(marked_stem)
+    else:
+        nominative_plain = unstressed(make_form('', None, endings[0], not headword_stem_stressed))
+        if not plain.endswith(nominative_plain):
+            return None
+        stem = plain[:len(plain) - len(nominative_plain)]
+
+    marked_plural = arguments.get('основа1') or None
+    plural_stem = unstressed(marked_plural) if marked_plural is not None else stem
+
+    if not vowel_positions(stem + plural_stem):
+        return None
+    # ё of the stem turns into е when the ending is stressed, such stems are left to the template
+    if scheme != 'a' and 'ё' in stem + plural_stem and marked_plural is None:
+        return None
+    if decl_type == 8 and stem[-1:] in hissing:
+        endings = endings[:8] + ('ам', None, 'ами', 'ах')
+
+    stem_stress = stem_stress_for(stem, marked_stem, headword, scheme, headword_stem_stressed)
+    plural_stress = stem_stress_for(plural_stem, marked_plural, headword, scheme, headword_stem_stressed) \
+        if marked_plural is not None else stem_stress
+    if stem_stress is None and scheme != 'b':
+        return None
+
+    forms = [[None] * 6, [None] * 6]
+    for number in range(2):
+        for case in range(6):
+            ending = endings[number * 6 + case]
+            if ending is None: continue
+            on_ending = noun_on_ending(scheme, number, case, animacy)
+            if number == 0:
+                forms[number][case] = make_form(stem, stem_stress, ending, on_ending)
+            else:
+                forms[number][case] = make_form(plural_stem, plural_stress, ending, on_ending)
+
+    # accusative: animate nouns take the genitive, inanimate the nominative; feminine singular has its own
+    for number in range(2):
+        if forms[number][3] is None:
+            forms[number][3] = forms[number][1] if animacy == 'a' and (number == 1 or gender == 'm') \
+                else forms[number][0]
+
+    if not matches_headword(forms[0][0], headword):
+        return None
+    return forms
+
+
+def noun_variants(word_acc, template, base, opencorpora_tag, universalD_tag):
+    # variants of a 'сущ ru' template as parse_template makes them from the expanded table, None if unsupported
+    index = noun_index(template)
+    arguments = template_arguments(template)
+    if index is None or arguments is None or not set(arguments) <= TABLE_NEUTRAL:
+        return None
+
+    forms = noun_forms(word_acc[0], arguments, *index)
+    if forms is None:
+        return None
+    if base is None:
+        base = unstressed(forms[0][0])
+
+    variants = []
+    for case in range(6):
+        for number in range(2):
+            opencorpora_tag_copy = copy.deepcopy(opencorpora_tag)
+            universalD_tag_copy = copy.deepcopy(universalD_tag)
+
+            opencorpora_tag_copy['tag']['Case'] = r_case_opencorpora[CASES[case]]
+            universalD_tag_copy['tag']['Case'] = r_case_universalD[CASES[case]]
+            opencorpora_tag_copy['tag']['Number'] = r_number_opencorpora[NUMBERS[number]]
+            universalD_tag_copy['tag']['Number'] = r_number_universalD[NUMBERS[number]]
+
+            variants.append([[forms[number][case]], base, opencorpora_tag_copy, universalD_tag_copy])
+
+    return variants
+
+
+def adjective_index(template):
+    parts = template.name.strip().split()
+    if len(parts) != 3 or parts[:2] != ['прил', 'ru'] or parts[2] not in ADJECTIVE_INDICES:
+        return None
+    return int(parts[2][0]), parts[2][1]
+
+
+def adjective_variants(word_acc, template, base, opencorpora_tag, universalD_tag):
+    # variants of a 'прил ru' template in the order parse_table_declension reads the table, None if unsupported.
+    # Neuter and feminine accusatives are one merged cell, masculine and plural ones are split by animacy
+    index = adjective_index(template)
+    arguments = template_arguments(template)
+    if index is None or arguments is None or not set(arguments) <= TABLE_NEUTRAL | {'тип', 'степень'}:
+        return None
+    decl_type, scheme = index
+    endings = ADJECTIVE_ENDINGS[decl_type]
+    on_ending = scheme == 'b'
+
+    headword = word_acc[0]
+    plain = unstressed(headword)
+    marked_stem = arguments.get('основа') or None
+    stem = unstressed(marked_stem) if marked_stem is not None else plain[:-2]
+    stem_stress = stem_stress_for(stem, marked_stem, headword, scheme, not on_ending)
+    if not vowel_positions(stem) or (stem_stress is None and not on_ending) or (on_ending and 'ё' in stem):
+        return None
+
+    if not matches_headword(make_form(stem, stem_stress, endings['m'][0], on_ending), headword):
+        return None
+
+    rows = list(enumerate(ADJECTIVE_ROWS))
+    if arguments.get('тип') != 'относительное':
+        rows.append((7, 'краткая'))
+
+    variants = []
+    for row, case in rows:
+        for column, number, gender in ADJECTIVE_COLUMNS:
+            # merged accusative cells are read once, without animacy
+            if row == 4 and column in ('n', 'f'):
+                continue
+            animacy = None
+            if row in (3, 4) and column in ('m', 'p'):
+                animacy = 'a' if row == 3 else 'ina'
+
+            # short forms of b are stressed on the ending, the masculine on the stem's last vowel
+            form = make_form(stem, stem_stress, endings[column][row], on_ending)
+
+            opencorpora_tag_copy = copy.deepcopy(opencorpora_tag)
+            universalD_tag_copy = copy.deepcopy(universalD_tag)
+            if row < 7:
+                opencorpora_tag_copy['tag']['Case'] = r_case_opencorpora[case]
+                universalD_tag_copy['tag']['Case'] = r_case_universalD[case]
+            else:
+                opencorpora_tag_copy['pos'] = 'ADJS'
+                universalD_tag_copy['tag']['Variant'] = 'Short'
+            opencorpora_tag_copy['tag']['Number'] = r_number_opencorpora[number]
+            universalD_tag_copy['tag']['Number'] = r_number_universalD[number]
+            if gender is not None:
+                opencorpora_tag_copy['tag']['Gender'] = r_gender_opencorpora[gender]
+                universalD_tag_copy['tag']['Gender'] = r_gender_universalD[gender]
+            if animacy is not None:
+                opencorpora_tag_copy['tag']['Animacy'] = r_anim_opencorpora[animacy]
+                universalD_tag_copy['tag']['Animacy'] = r_anim_universalD[animacy]
+
+            variants.append([[form], base, opencorpora_tag_copy, universalD_tag_copy])
+
+    return variants
+
+
+def is_local(template):
+    # True if the template's table is made here, so it needn't be expanded remotely
+    arguments = template_arguments(template)
+    if arguments is None:
+        return False
+    if noun_index(template) is not None:
+        return set(arguments) <= TABLE_NEUTRAL
+    if adjective_index(template) is not None:
+        return set(arguments) <= TABLE_NEUTRAL | {'тип', 'степень'}
+    return False
@@ -0,0 +1,164 @@
+import os
+import threading
+from typing import Dict, Tuple
+
+from dictionary import AccentDictionary, TABLES, object_bytes
+from resolver import HomographResolver
+from suffix_model import SuffixModel
+
+
+class DictionaryHandle:
+    # Versioned dictionary with snapshot semantics.
+    # current is one loaded AccentDictionary that is never changed after it is published:
+    # readers take it once per call or batch, writers build the next version aside
+    # (reload() from disk, update() on a clone) and publish it with a single assignment,
+    # so lookups are never blocked and never see a half-applied change.
+    # Lazy homograph tables of a published version are still loaded on first access, from the files
+    # it was loaded with (AccentDictionary.pin_files()), so a version never pairs its accents with
+    # homograph tables compact() or compile() wrote after it.
+
+    def __init__(self, storage='dict', path='.'):
+        self.storage = storage
+        self.path = path
+        self.lock = threading.Lock() # serializes writers, readers never take it
+        self.version = 0
+        self.current = self.build()
+        self.watcher = None
+        self.stop_watching = threading.Event()
+
+    def build(self):
+        dictionary = AccentDictionary(self.storage, self.path)
+        dictionary.load()
+        return dictionary
+
+    def publish(self, dictionary):
+        self.current = dictionary
+        self.version += 1
+
+    def reload(self):
+        # picks up recompiled or resaved tables
+        with self.lock:
+            self.publish(self.build())
+        return self.current
+
+    def update(self, mutator):
+        # mutator(dictionary) changes a writable clone of the current version, which is then published.
+        # If it raises, nothing is published
+        with self.lock:
+            dictionary = self.current.clone()
+            mutator(dictionary)
+            self.publish(dictionary)
+        return dictionary
+
+    def files(self):
+        # modification times of the table files a reload would read
+        times = {}
+        for name in TABLES + ('journal',):
+            for extension in ('.pickle', '.bin', '.log'):
+                file_name = self.current.file_name(name, extension)
+                if os.path.exists(file_name):
+                    times[file_name] = os.stat(file_name).st_mtime_ns
+        return times
+
+    def watch(self, interval=1.0):
+        # reloads in a daemon thread whenever table files change, until unwatch()
+        if self.watcher is not None:
+            return self.watcher
+
+        def poll():
+            seen = self.files()
+            while not self.stop_watching.wait(interval):
+                files = self.files()
+                if files != seen:
+                    seen = files
+                    try:
+                        self.reload()
+                        print('reloaded', self.path, 'version', self.version)
+                    except Exception as e: # a file may be caught half written, the next change retries
+                        print('reload failed:', repr(e))
+
+        self.stop_watching.clear()
+        self.watcher = threading.Thread(target=poll, name='dictionary-watcher', daemon=True)
+        self.watcher.start()
+        return self.watcher
+
+    def unwatch(self):
+        if self.watcher is not None:
+            self.stop_watching.set()
+            self.watcher.join()
+            self.watcher = None
+
+
+class DictionaryRegistry:
+    # Dictionaries loaded once per process and shared by every Accentizer using them.
+    # Forked workers inherit the loaded dictionaries.
+
+    def __init__(self):
+        self.handles: Dict[Tuple[str, str], DictionaryHandle] = {}
+        self.suffix_models: Dict[Tuple[str, str], SuffixModel] = {}
+        self.resolvers: Dict[int, HomographResolver] = {} # by morph cache size
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(storage, path):
+        return storage, os.path.abspath(path)
+
+    def handle(self, storage='dict', path='.'):
+        key = self.key(storage, path)
+        handle = self.handles.get(key)
+        if handle is None:
+            with self.lock:
+                handle = self.handles.get(key)
+                if handle is None:
+                    handle = self.handles[key] = DictionaryHandle(storage, path)
+        return handle
+
+    def get(self, storage='dict', path='.'):
+        # current version of a dictionary
+        return self.handle(storage, path).current
+
+    def suffix_model(self, dictionary):
+        # suffix model saved next to the dictionary, None if there is none
+        key = self.key(dictionary.storage, dictionary.path)
+        if key not in self.suffix_models:
+            with self.lock:
+                if key not in self.suffix_models:
+                    model_file = dictionary.file_name('suffix_model')
+                    self.suffix_models[key] = SuffixModel.load(model_file) if os.path.exists(model_file) else None
+        return self.suffix_models[key]
+
+    def resolver(self, cache_size=100000):
+        # homograph resolver shared by every Accentizer, one pymorphy2 analyzer and parse cache per process
+        resolver = self.resolvers.get(cache_size)
+        if resolver is None:
+            with self.lock:
+                resolver = self.resolvers.get(cache_size)
+                if resolver is None:
+                    resolver = self.resolvers[cache_size] = HomographResolver(cache_size=cache_size)
+        return resolver
+
+    def release(self, storage='dict', path='.'):
+        # forgets a dictionary, it is freed when the last Accentizer using it is gone
+        key = self.key(storage, path)
+        with self.lock:
+            handle = self.handles.pop(key, None)
+            self.suffix_models.pop(key, None)
+        if handle is not None:
+            handle.unwatch()
+
+    def clear(self):
+        for storage, path in list(self.handles):
+            self.release(storage, path)
+        self.resolvers.clear()
+
+    def memory_usage(self):
+        # {(storage, path): {table name: bytes}} of the current versions
+        usage = {}
+        for key, handle in list(self.handles.items()):
+            usage[key] = handle.current.memory_usage()
+            if self.suffix_models.get(key) is not None:
+                usage[key]['suffix_model'] = object_bytes(self.suffix_models[key])
+        return usage
+
+
+registry = DictionaryRegistry()
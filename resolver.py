@@ -0,0 +1,88 @@
+from morph import Morph
+from morph_cache import CachedMorphAnalyzer
+
+
+class SentenceAnalysis:
+    # pymorphy2 parses of the sentence words, every word is parsed at most once
+    # and only if a homograph or its neighbour needs it
+    def __init__(self, morpher, words):
+        self.morpher = morpher
+        self.words = words
+        self.parses = [None] * len(words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        if self.parses[index] is None:
+            self.parses[index] = self.morpher.parse(self.words[index])
+        return self.parses[index]
+
+
+def morph_matches(stored: Morph, parsed: Morph):
+    # tags missing in the analysis don't contradict the stored morph
+    a = stored.opencorpora_tags
+    b = parsed.opencorpora_tags
+    if a is None or a.pos != b.pos:
+        return False
+
+    if stored.base is not None and stored.base.replace('ё', 'е') != parsed.base.replace('ё', 'е'):
+        return False
+
+    for name, value in a.tags.items():
+        if name in b.tags and b.tags[name] != value:
+            return False
+    return True
+
+
+class HomographResolver:
+
+    def __init__(self, morpher=None, cache_size=100000):
+        if not isinstance(morpher, CachedMorphAnalyzer):
+            morpher = CachedMorphAnalyzer(morpher, cache_size)
+        self.morpher = morpher
+
+    def analyze(self, words):
+        return SentenceAnalysis(self.morpher, words)
+
+    @staticmethod
+    def context_score(parse, previous, next):
+        # prepositions never govern nominative, adjacent nouns and adjectives agree in case and number
+        case = parse.tag.case
+        if case is None:
+            return 0
+
+        score = 0
+        if previous is not None and 'PREP' in previous.tag:
+            score += 1 if case != 'nomn' else -1
+
+        for neighbour in (previous, next):
+            if neighbour is None: continue
+            if neighbour.tag.POS in ('NOUN', 'ADJF', 'PRTF') and neighbour.tag.case == case \
+                    and neighbour.tag.number == parse.tag.number:
+                score += 1
+
+        return score
+
+    def ranked(self, analysis, index):
+        parses = analysis[index]
+        if len(parses) < 2:
+            return parses
+
+        previous = analysis[index - 1][0] if index > 0 else None
+        next = analysis[index + 1][0] if index + 1 < len(analysis) else None
+        return sorted(parses, key=lambda p: (self.context_score(p, previous, next), p.score), reverse=True)
+
+    def resolve(self, analysis, index, morphs):
+        # morphs: {Morph: position} of the homograph, returns None if the position can't be chosen
+        for parse in self.ranked(analysis, index):
+            morph = self.morpher.morph(parse)
+            if morph is None: continue
+
+            positions = {pos for stored, pos in morphs.items() if morph_matches(stored, morph)}
+            if len(positions) == 1:
+                return positions.pop()
+            if len(positions) > 1:
+                return None
+
+        return None
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+from accentizer import Accentizer
+from dictionary import STORAGES
+from metrics import Metrics
+from utilities import put_accents
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class LatencyStats:
+    # latencies of the last size requests
+    def __init__(self, size=10000):
+        self.latencies = deque(maxlen=size)
+        self.requests = 0
+
+    def add(self, seconds):
+        self.latencies.append(seconds)
+        self.requests += 1
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def snapshot(self):
+        return {'requests': self.requests,
+                'p50_ms': self.percentile(50) * 1000,
+                'p99_ms': self.percentile(99) * 1000}
+
+
+class AccentizerServer:
+    # HTTP/1.1 JSON service around one loaded Accentizer.
+    # Texts of concurrent requests are collected into one accentize_batch call:
+    # a batch is started by the first waiting request and closed after max_wait seconds
+    # or when it has max_batch texts, whichever comes first.
+    #
+    # POST /accentize {"text": "..."} or {"texts": ["...", ...]}
+    #   -> {"text": accentized text, "accents": [[word, pos], ...]} or lists of them for "texts"
+    # GET /stats -> latency percentiles and batch sizes
+    # GET /metrics -> accentizer metrics in Prometheus text format, if the accentizer has them
+
+    max_body = 1 << 20 # bytes of a request body
+
+    def __init__(self, accentizer, max_batch=256, max_wait=0.005):
+        self.accentizer = accentizer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = None
+        self.latency = LatencyStats()
+        self.batches = 0
+        self.batched_texts = 0
+        self.server = None
+        self.batcher = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self.run_batches())
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+
+    async def accentize(self, texts):
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def run_batches(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while count < self.max_batch:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0: break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                batch.append(item)
+                count += len(item[0])
+
+            texts = [text for item in batch for text in item[0]]
+            try:
+                # accentizing runs off the event loop so connections keep being served meanwhile
+                accents = await loop.run_in_executor(None, self.accentizer.accentize_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done(): future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_texts += len(texts)
+
+            start = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(accents[start:start + len(item_texts)])
+                start += len(item_texts)
+
+    def stats(self):
+        stats = self.latency.snapshot()
+        stats['batches'] = self.batches
+        stats['mean_batch_size'] = self.batched_texts / self.batches if self.batches > 0 else 0.0
+        stats['queued'] = self.queue.qsize() if self.queue is not None else 0
+        return stats
+
+    async def handle_request(self, method, target, body):
+        if target == '/stats':
+            if method != 'GET': return 405, {'error': 'use GET'}
+            return 200, self.stats()
+
+        if target == '/metrics':
+            if method != 'GET': return 405, {'error': 'use GET'}
+            if self.accentizer.metrics is None: return 404, {'error': 'metrics are disabled'}
+            return 200, self.accentizer.metrics.to_prometheus()
+
+        if target != '/accentize':
+            return 404, {'error': 'unknown path'}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+
+        try:
+            request = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return 400, {'error': 'body is not json'}
+
+        if isinstance(request, dict) and isinstance(request.get('text'), str):
+            accents = await self.accentize([request['text']])
+            return 200, {'text': put_accents(request['text'], accents[0]), 'accents': accents[0]}
+
+        if isinstance(request, dict) and isinstance(request.get('texts'), list) \
+                and all(isinstance(x, str) for x in request['texts']):
+            accents = await self.accentize(request['texts'])
+            return 200, {'texts': [put_accents(t, a) for t, a in zip(request['texts'], accents)], 'accents': accents}
+
+        return 400, {'error': 'expected {"text": str} or {"texts": [str]}'}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'bad request line'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {'error': 'bad content-length'}, False)
+                    break
+                if length > self.max_body:
+                    # the body isn't read, so the connection can't be reused
+                    await self.respond(writer, 413, {'error': 'body is larger than {} bytes'.format(self.max_body)}, False)
+                    break
+                body = await reader.readexactly(length)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                try:
+                    status, response = await self.handle_request(method, target, body)
+                except Exception as e:
+                    status, response = 500, {'error': repr(e)}
+
+                await self.respond(writer, status, response, keep_alive)
+                if target == '/accentize':
+                    self.latency.add(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, response, keep_alive):
+        # strings are sent as plain text, anything else as json
+        if isinstance(response, str):
+            body, content_type = response.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(response, ensure_ascii=False).encode('utf-8'), 'application/json'
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: {}; charset=utf-8\r\n'
+                     'Content-Length: {}\r\nConnection: {}\r\n\r\n'
+                     .format(status, STATUS[status], content_type, len(body), 'keep-alive' if keep_alive else 'close')
+                     .encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(accentizer, host, port, max_batch, max_wait):
+    server = AccentizerServer(accentizer, max_batch, max_wait)
+    await server.start(host, port)
+    print('listening on {}:{}'.format(host, port))
+    await server.server.serve_forever()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Accentizer HTTP service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=256, help='texts per batch')
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='time to collect a batch')
+    parser.add_argument('--storage', choices=STORAGES, default='dict', help='accents table storage')
+    parser.add_argument('--dictionary', default='.', help='dictionary directory')
+    parser.add_argument('--metrics', action='store_true', help='collect lookup metrics, served on GET /metrics')
+    parser.add_argument('--watch', type=float, default=0, metavar='SECONDS',
+                        help='reload the dictionary when its files change, checked every SECONDS')
+    args = parser.parse_args(args)
+
+    accentizer = Accentizer(args.storage, args.dictionary, Metrics() if args.metrics else None)
+    if args.watch > 0:
+        accentizer.handle.watch(args.watch)
+    asyncio.run(serve(accentizer, args.host, args.port, args.max_batch, args.max_wait_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import pickle
+import sys
+from collections import Counter
+from typing import Dict, Tuple
+
+from utilities import count_vovels, normalize, russian_vowels
+
+
+class SuffixModel:
+    # Predicts accent positions of unknown word forms from their endings.
+    # For every ending up to max_suffix letters the model keeps the most frequent accent offset
+    # from the end of the word (len(word) - pos) among dictionary words with that ending,
+    # and the share of those words that have it. Endings predicting the same offset
+    # as their one letter shorter ending are pruned, the longest known ending decides.
+
+    def __init__(self, max_suffix=7):
+        self.max_suffix = max_suffix
+        self.suffixes: Dict[str, Tuple[int, float]] = {} # ending: (offset from the end, confidence)
+
+    @classmethod
+    def build(cls, accents, max_suffix=7, min_count=2):
+        model = cls(max_suffix)
+        stats: Dict[str, Counter] = {}
+
+        for word, pos in accents.items():
+            word = normalize(word)
+            offset = len(word) - pos
+            for k in range(1, min(max_suffix, len(word)) + 1):
+                suffix = word[-k:]
+                counter = stats.get(suffix)
+                if counter is None:
+                    counter = stats[suffix] = Counter()
+                counter[offset] += 1
+
+        # shorter endings first, so the parent of an ending is decided before it
+        for suffix in sorted(stats, key=len):
+            counter = stats[suffix]
+            total = sum(counter.values())
+            if total < min_count and len(suffix) > 1: continue
+
+            offset, count = counter.most_common(1)[0]
+            parent = model.longest_suffix(suffix[1:])
+            if parent is not None and parent[0] == offset and abs(parent[1] - count / total) < 0.05:
+                continue
+            model.suffixes[suffix] = (offset, count / total)
+
+        return model
+
+    def longest_suffix(self, key):
+        # prediction of the longest known ending of key
+        for k in range(min(self.max_suffix, len(key)), 0, -1):
+            prediction = self.suffixes.get(key[-k:])
+            if prediction is not None:
+                return prediction
+        return None
+
+    def predict(self, word):
+        # (accent position, confidence) or None
+        key = normalize(word)
+        suffixes = self.suffixes
+        for k in range(min(self.max_suffix, len(key)), 0, -1):
+            prediction = suffixes.get(key[-k:])
+            if prediction is None: continue
+
+            offset, confidence = prediction
+            pos = len(key) - offset
+            # positions are indices of the stressed vowel
+            if 0 <= pos < len(key) and key[pos] in russian_vowels:
+                return pos, confidence
+        return None
+
+    def save(self, file_name='suffix_model.pickle'):
+        with open(file_name, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(file_name='suffix_model.pickle'):
+        with open(file_name, 'rb') as f:
+            return pickle.load(f)
+
+
+if __name__ == "__main__":
+    # python suffix_model.py [dictionary directory] [model file]
+    from dictionary import AccentDictionary
+
+    dictionary = AccentDictionary(path=sys.argv[1] if len(sys.argv) > 1 else '.')
+    dictionary.load()
+
+    model = SuffixModel.build({w: p for w, p in dictionary.accents.items() if count_vovels(w) > 1})
+    model.save(sys.argv[2] if len(sys.argv) > 2 else dictionary.file_name('suffix_model'))
+    print('endings', len(model.suffixes))
@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+from accentizer import Accentizer
+from dictionary import AccentDictionary
+from registry import registry
+from utilities import find_words
+
+ACCENTS = {'молоко': 5, 'корова': 3, 'облако': 0, 'ежевика': 4, 'берёза': 3}
+TEXTS = [
+    'Корова дает молоко.',
+    'МОЛОКО и Облако, облако и молоко',
+    'ёжевика, Ежевика и ЁЖЕВИКА',
+    'Берёза и березы, БЕРЕЗА',
+    'кот и мк',
+    '',
+]
+
+
+@pytest.fixture
+def accentizer(tmp_path):
+    dictionary = AccentDictionary(path=str(tmp_path))
+    dictionary.load()
+    for word, pos in ACCENTS.items():
+        dictionary.add_accent(word, pos)
+    dictionary.compact()
+    yield Accentizer('dict', str(tmp_path))
+    registry.clear()
+
+
+def test_batch_matches_single_words(accentizer):
+    batch = accentizer.accentize_batch(TEXTS)
+    single = [[(word, accentizer.get_accent(word, sentence=text)) for word in find_words(text)] for text in TEXTS]
+    assert batch == single
+    assert batch[1] == [('МОЛОКО', 5), ('и', -1), ('Облако', 0), ('облако', 0), ('и', -1), ('молоко', 5)]
+    # words with ё are taken as accented
+    assert batch[2] == [('ёжевика', -1), ('Ежевика', 4), ('и', -1), ('ЁЖЕВИКА', -1)]
+
+
+def test_batch_of_batches(accentizer):
+    assert accentizer.accentize_batch(TEXTS) == [accentizer.accentize_batch([text])[0] for text in TEXTS]
+
+
+def test_one_lookup_key_for_case_and_yo(accentizer):
+    # берёза was added with ё, its key is folded to е
+    assert set(accentizer.dictionary.accents) == {'молоко', 'корова', 'облако', 'ежевика', 'береза'}
+    for word in ('береза', 'Береза', 'БЕРЕЗА', 'бЕрЕзА'):
+        assert accentizer.get_accent(word) == 3
+    words = ['Облако', 'ОБЛАКО', 'Ежевика', 'ЕЖЕВИКА', 'Береза']
+    assert accentizer.accentize_batch([' '.join(words)]) == [[(word, accentizer.get_accent(word)) for word in words]]
+
+
+class StubResolver:
+    # resolves a homograph to its index in the sentence, records the analyzed sentences
+    def __init__(self):
+        self.analyzed = []
+
+    def analyze(self, words):
+        self.analyzed.append(words)
+        return words
+
+    def resolve(self, analysis, index, morphs):
+        return index
+
+
+def test_sentence_is_analyzed_once_and_repeated_words_keep_their_index(accentizer):
+    dictionary = accentizer.dictionary
+    dictionary.homographs['замок'] = [{0, 1}, {}]
+    accentizer.resolver = StubResolver()
+    sentence = 'Замок на замок, замок'
+
+    assert accentizer.get_accent('замок', sentence=sentence, index=2) == 2
+    assert accentizer.get_accent('замок', sentence=sentence, index=3) == 3
+    assert accentizer.get_accent('Замок', sentence=sentence, index=0) == 0
+    # the first occurrence without an index or with one of another word
+    assert accentizer.get_accent('замок', sentence=sentence) == 2
+    assert accentizer.get_accent('замок', sentence=sentence, index=1) == 2
+    assert accentizer.resolver.analyzed == [('Замок', 'на', 'замок', 'замок')]
+
+    assert accentizer.accentize_batch([sentence]) == [[('Замок', 0), ('на', -1), ('замок', 2), ('замок', 3)]]
+    assert len(accentizer.resolver.analyzed) == 1
@@ -0,0 +1,59 @@
+import api_cache
+from api_cache import ApiCache, PAGES, TEMPLATES
+
+
+class Clock:
+    # stands in for the time module of api_cache
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, ttl=100):
+    clock = Clock()
+    monkeypatch.setattr(api_cache, 'time', clock)
+    return ApiCache(str(tmp_path / 'cache.sqlite'), ttl), clock
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put(PAGES, 'ru:кот', '== кот ==', 11)
+    cache.put(TEMPLATES, 'ru:{{a}}', '<a>')
+
+    for now, cached in ((1000.0, True), (1100.0, True), (1100.5, False)):
+        clock.now = now
+        for kind, key, value in ((PAGES, 'ru:кот', '== кот =='), (TEMPLATES, 'ru:{{a}}', '<a>')):
+            # has() and get() agree at every age
+            assert cache.has(kind, key) == cached
+            assert cache.get(kind, key) == (value if cached else None)
+    assert cache.has(PAGES, 'ru:пёс') is False
+    assert cache.get(PAGES, 'ru:пёс') is None
+
+    # has() is not counted
+    assert (cache.hits, cache.misses) == (4, 3)
+    # an expired entry is fetched and put again
+    cache.put(PAGES, 'ru:кот', '== кот 2 ==', 12)
+    assert cache.get(PAGES, 'ru:кот') == '== кот 2 =='
+    cache.close()
+
+
+def test_revalidate_refreshes_current_revisions(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put(PAGES, 'ru:кот', '== кот ==', 11)
+    cache.put(PAGES, 'ru:пёс', '== пёс ==', 13)
+    cache.put(PAGES, 'ru:нет', '', 0)
+
+    clock.now += 150
+    assert not cache.has(PAGES, 'ru:кот')
+    cache.revalidate({'ru:кот': 11, 'ru:пёс': 14, 'ru:нет': 0, 'ru:мышь': 15})
+    assert cache.get(PAGES, 'ru:кот') == '== кот =='
+    assert cache.get(PAGES, 'ru:нет') == ''
+    assert sorted(cache.keys(PAGES)) == ['ru:кот', 'ru:нет']
+    cache.close()
+
+    # kept on disk for later runs
+    reopened = ApiCache(cache.file_name, cache.ttl)
+    assert reopened.get(PAGES, 'ru:кот') == '== кот =='
+    reopened.close()
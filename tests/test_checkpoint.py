@@ -0,0 +1,94 @@
+import pytest
+
+from checkpoint import Checkpoint
+
+WORDS = ['корова', 'молоко', 'облако', 'голова', 'ворона']
+
+
+class StubDictionary:
+    # journal_offset grows with every save, saves are recorded in events shared with the checkpoint
+    def __init__(self, events):
+        self.events = events
+        self.journal_offset = 0
+
+    def save_if_changed(self):
+        self.journal_offset += 10
+        self.events.append(('dictionary', self.journal_offset))
+
+
+def run(file_name, words, fail=None, defer=()):
+    # processes words until fail, returns the processed ones
+    checkpoint = Checkpoint(file_name)
+    checkpoint.load()
+    done = []
+    for word in checkpoint.resume(words):
+        if word == fail:
+            raise KeyboardInterrupt(word)
+        if word in defer:
+            checkpoint.defer(word)
+            continue
+        done.append(word)
+    return done
+
+
+def test_resume_after_interruption(tmp_path):
+    file_name = str(tmp_path / 'checkpoint.pickle')
+    with pytest.raises(KeyboardInterrupt):
+        run(file_name, WORDS, fail='облако')
+
+    # the word whose processing raised is done again
+    assert run(file_name, WORDS) == ['облако', 'голова', 'ворона']
+    checkpoint = Checkpoint(file_name)
+    assert checkpoint.load()
+    assert (checkpoint.index, checkpoint.word, checkpoint.pending) == (5, 'ворона', [])
+    assert run(file_name, WORDS + ['береза']) == ['береза']
+
+
+def test_deferred_words_are_retried_first(tmp_path):
+    file_name = str(tmp_path / 'checkpoint.pickle')
+    assert run(file_name, WORDS[:3], defer={'молоко'}) == ['корова', 'облако']
+
+    checkpoint = Checkpoint(file_name)
+    checkpoint.load()
+    assert checkpoint.pending == ['молоко']
+    assert run(file_name, WORDS) == ['молоко', 'голова', 'ворона']
+    checkpoint.load()
+    assert checkpoint.pending == []
+
+
+def test_changed_word_list(tmp_path):
+    file_name = str(tmp_path / 'checkpoint.pickle')
+    run(file_name, WORDS[:2])
+    with pytest.raises(ValueError, match='the word list has changed'):
+        run(file_name, ['корова', 'облако', 'голова'])
+
+
+class RecordingCheckpoint(Checkpoint):
+    def __init__(self, file_name, events):
+        Checkpoint.__init__(self, file_name)
+        self.events = events
+
+    def save(self, journal_offset=None):
+        self.events.append(('checkpoint', journal_offset))
+        Checkpoint.save(self, journal_offset)
+
+
+def test_dictionary_is_saved_before_the_checkpoint(tmp_path):
+    events = []
+    checkpoint = RecordingCheckpoint(str(tmp_path / 'checkpoint.pickle'), events)
+    assert list(checkpoint.resume(WORDS[:2], StubDictionary(events))) == WORDS[:2]
+
+    assert events == [('dictionary', 10), ('checkpoint', 10), ('dictionary', 20), ('checkpoint', 20),
+                      ('dictionary', 30), ('checkpoint', 30)]
+    resumed = Checkpoint(checkpoint.file_name)
+    resumed.load()
+    assert resumed.journal_offset == 30
+
+
+def test_shorter_journal_is_reported(tmp_path, capsys):
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.pickle'))
+    checkpoint.save(100)
+    checkpoint.check_journal(100)
+    assert 'journal is shorter' not in capsys.readouterr().out
+    checkpoint.check_journal(40)
+    assert 'journal is shorter than at the checkpoint (40 < 100)' in capsys.readouterr().out
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+from compact import CompactTable, main
+from dictionary import AccentDictionary, JournalError, journaled
+
+
+def test_compile_folds_the_journal(tmp_path):
+    path = str(tmp_path)
+    dictionary = AccentDictionary(path=path)
+    dictionary.load()
+    dictionary.add_accent('молоко', 5)
+    dictionary.compact()
+    dictionary.add_accent('корова', 3)
+    dictionary.save()
+    assert os.path.exists(dictionary.file_name('journal', '.log'))
+
+    main([path])
+
+    assert not os.path.exists(dictionary.file_name('journal', '.log'))
+    mapped = AccentDictionary('mapped', path)
+    mapped.load()
+    # nothing was replayed, the tables are still the mapped ones
+    assert isinstance(mapped.accents, CompactTable)
+    assert mapped.accents['молоко'] == 5
+    assert mapped.accents['корова'] == 3
+
+
+def test_no_compile_only_folds_the_journal(tmp_path):
+    path = str(tmp_path)
+    dictionary = AccentDictionary(path=path)
+    dictionary.load()
+    dictionary.add_accent('молоко', 5)
+    dictionary.save()
+
+    main([path, '--no-compile'])
+
+    assert not os.path.exists(dictionary.file_name('journal', '.log'))
+    assert not os.path.exists(dictionary.file_name('accents', '.bin'))
+    reloaded = AccentDictionary(path=path)
+    reloaded.load()
+    assert reloaded.accents['молоко'] == 5
+
+
+def test_lookup_without_homograph_keys_index(tmp_path):
+    path = str(tmp_path)
+    dictionary = AccentDictionary(path=path)
+    dictionary.load()
+    dictionary.homographs['замок'] = [{1, 3}, {}]
+    dictionary.homographs_unresolvable['мука'] = [{0, 3}, {}]
+    dictionary.compact()
+    # saved before compact() wrote the index
+    os.remove(dictionary.file_name('homograph_keys'))
+
+    reloaded = AccentDictionary(path=path)
+    reloaded.load()
+    assert reloaded.homograph_table('молоко') is None
+    assert reloaded.homograph_table('мука') == 'homographs_unresolvable'
+    for name in ('homographs', 'homographs_unresolvable', 'homographs_old'):
+        assert not reloaded.is_loaded(name)
+    # written for the next loads
+    assert os.path.exists(dictionary.file_name('homograph_keys'))
+    assert [f for f in os.listdir(path) if f.endswith('.tmp')] == []
+
+
+class FailingDictionary(AccentDictionary):
+    fail = True
+
+    @journaled
+    def add_then_fail(self, word, pos):
+        self.add_accent(word, pos)
+        if self.fail:
+            raise ValueError(word)
+
+
+def test_replay_checks_recorded_outcomes(tmp_path, capsys):
+    path = str(tmp_path)
+    dictionary = FailingDictionary(path=path)
+    dictionary.load()
+    with pytest.raises(ValueError):
+        dictionary.add_then_fail('молоко', 5)
+    dictionary.add_accent('корова', 3)
+    dictionary.save()
+
+    replayed = FailingDictionary(path=path)
+    replayed.load()
+    assert replayed.accents == {'молоко': 5, 'корова': 3}
+    assert "journal: record 0 add_then_fail ('молоко', 5) raised ValueError('молоко')" in capsys.readouterr().out
+
+    # the call returns on replay, it raised when it was made
+    FailingDictionary.fail = False
+    try:
+        with pytest.raises(JournalError, match='record 0 add_then_fail'):
+            FailingDictionary(path=path).load()
+    finally:
+        FailingDictionary.fail = True
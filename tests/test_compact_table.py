@@ -0,0 +1,31 @@
+from array import array
+
+import pytest
+
+from compact import EMPTY, CompactAccents, CompactObjects, CompactTable, open_table
+
+
+def test_accents_round_trip(tmp_path):
+    accents = {'молоко': 5, 'корова': 3, 'облако': 0, 'café': 3}
+    table = CompactAccents.from_dict(accents)
+    assert dict(table.items()) == accents
+    assert 'молок' not in table and table.get('молок') is None
+
+    table.save(str(tmp_path / 'accents.bin'))
+    mapped = open_table(str(tmp_path / 'accents.bin'))
+    assert dict(mapped.items()) == accents
+
+
+def test_objects_round_trip(tmp_path):
+    homographs = {'замок': [{1, 3}, {}], 'мука': [{1, 3}, {'NOUN': 1}]}
+    CompactObjects.from_dict(homographs).save(str(tmp_path / 'homographs.bin'))
+    assert dict(open_table(str(tmp_path / 'homographs.bin')).items()) == homographs
+
+
+def test_incomplete_subclass_fails_on_creation():
+    class Incomplete(CompactTable):
+        def value(self, i):
+            return i
+
+    with pytest.raises(TypeError):
+        Incomplete(b'', array('I', [0]), array('I', [EMPTY]))
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+import crawler
+from checkpoint import Checkpoint
+from morph_cache import BoundedCache
+from requests import RequestException
+
+
+class StubDictionary:
+    homographs = {}
+    homographs_unresolvable = {}
+    journal_offset = 0
+
+    def __init__(self):
+        self.applied = []
+
+    def save_if_changed(self):
+        pass
+
+
+def make_crawler(tmp_path, monkeypatch, pending, fail=(), stop=None):
+    # lookups of words in fail raise network errors, applying stop interrupts the crawl
+    def find_variants(word, known, morpher):
+        if word in fail:
+            raise RequestException(word)
+        return [word]
+
+    def apply_variants(dictionary, variants):
+        if variants == [stop]:
+            raise KeyboardInterrupt
+        dictionary.applied += variants
+
+    monkeypatch.setattr(crawler, 'find_variants', find_variants)
+    monkeypatch.setattr(crawler, 'apply_variants', apply_variants)
+    checkpoint = Checkpoint(str(tmp_path / 'build_checkpoint.pickle'))
+    checkpoint.pending = list(pending)
+    return crawler.Crawler(StubDictionary(), None, checkpoint, concurrency=2, rate=0, retries=0, backoff=0)
+
+
+def test_pending_words_are_removed_when_done(tmp_path, monkeypatch):
+    instance = make_crawler(tmp_path, monkeypatch, ['a', 'b', 'c'], fail={'b'})
+    instance.crawl(['x', 'y'])
+
+    assert instance.dictionary.applied == ['a', 'c', 'x', 'y']
+    assert instance.checkpoint.pending == ['b']
+    assert (instance.checkpoint.index, instance.checkpoint.word) == (2, 'y')
+
+
+def test_interrupted_crawl_keeps_unfinished_pending_words(tmp_path, monkeypatch):
+    instance = make_crawler(tmp_path, monkeypatch, ['a', 'b', 'c'], stop='b')
+    with pytest.raises(KeyboardInterrupt):
+        instance.crawl(['x'])
+
+    assert instance.dictionary.applied == ['a']
+    assert instance.checkpoint.pending == ['b', 'c']
+    assert instance.checkpoint.index == 0
+
+
+def test_bounded_cache_shared_by_threads():
+    cache = BoundedCache(maxsize=50)
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(5000):
+                key = (i * 7 + offset) % 200
+                assert cache.get(key, lambda k: k * 2) == key * 2
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(cache.data) <= 50
+    assert cache.hits + cache.misses == 8 * 5000
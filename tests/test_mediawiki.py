@@ -0,0 +1,121 @@
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+import mediawiki
+
+PAGES = {'Кот': ('кот', 11), 'Собака': ('собака', 12), 'пёс': ('пёс', 13)}
+NORMALIZED = {'кот': 'Кот', 'собака': 'Собака'}
+REDIRECTS = {'псина': 'пёс', 'Собака': 'пёс'}
+
+
+class StubWiki(BaseHTTPRequestHandler):
+    # api.php answering query and expandtemplates, calls are recorded in server.calls
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.reply(dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query)))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        self.reply(dict(urllib.parse.parse_qsl(body)))
+
+    def reply(self, params):
+        self.server.calls.append(params)
+        if params['action'] == 'expandtemplates':
+            text = params['text']
+            if '{{join}}' in text:
+                # a template that swallows the text after it, the marker included
+                text = text[:text.index('{{join}}')] + 'joined'
+            response = {'expandtemplates': {'wikitext': text.replace('{{', '<').replace('}}', '>')}}
+        else:
+            response = {'query': self.query(params)}
+
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def query(params):
+        query = {'pages': {}}
+        for title in params['titles'].split('|'):
+            if title in NORMALIZED:
+                query.setdefault('normalized', []).append({'from': title, 'to': NORMALIZED[title]})
+                title = NORMALIZED[title]
+            if title in REDIRECTS:
+                query.setdefault('redirects', []).append({'from': title, 'to': REDIRECTS[title]})
+                title = REDIRECTS[title]
+            if title in PAGES:
+                text, revid = PAGES[title]
+                page = {'title': title, 'lastrevid': revid}
+                if params['prop'] == 'revisions':
+                    page['revisions'] = [{'revid': revid, '*': text}]
+                query['pages'][str(revid)] = page
+            else:
+                query['pages'][str(-1 - len(query['pages']))] = {'title': title, 'missing': ''}
+        return query
+
+
+@pytest.fixture
+def wiki(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWiki)
+    server.calls = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(mediawiki, 'API_URL', 'http://127.0.0.1:{}/{{}}/api.php'.format(server.server_port))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_pages_resolves_normalized_titles_and_redirects(wiki):
+    pages = mediawiki.fetch_pages(['кот', 'собака', 'псина', 'пёс', 'нет', 'кот'])
+
+    assert len(wiki.calls) == 1
+    assert wiki.calls[0]['titles'] == 'кот|собака|псина|пёс|нет'
+    assert pages == {
+        'кот': ('кот', 11, 'Кот'),
+        'собака': ('пёс', 13, 'пёс'), # normalized to Собака, which redirects
+        'псина': ('пёс', 13, 'пёс'),
+        'пёс': ('пёс', 13, 'пёс'),
+        'нет': ('', 0, 'нет'),
+    }
+
+
+def test_fetch_revisions_in_batches_of_max_titles(wiki, monkeypatch):
+    monkeypatch.setattr(mediawiki, 'MAX_TITLES', 2)
+    revisions = mediawiki.fetch_revisions(['кот', 'псина', 'нет'])
+
+    assert [call['titles'] for call in wiki.calls] == ['кот|псина', 'нет']
+    assert revisions == {'кот': 11, 'псина': 13, 'нет': 0}
+
+
+def test_expand_templates_splits_one_call(wiki):
+    texts = ['{{a}}', 'b {{c|1}}', 'd']
+    assert mediawiki.expand_templates(texts) == ['<a>', 'b <c|1>', 'd']
+    assert len(wiki.calls) == 1
+    assert wiki.calls[0]['text'].count(mediawiki.SPLIT_MARKER) == 2
+
+
+def test_expand_templates_batches_by_size(wiki, monkeypatch):
+    monkeypatch.setattr(mediawiki, 'MAX_EXPAND_CHARS', 10)
+    texts = ['{{aaaa}}', '{{bb}}', 'c' * 20]
+    assert mediawiki.expand_templates(texts) == ['<aaaa>', '<bb>', 'c' * 20]
+    assert len(wiki.calls) == 3
+
+
+def test_expand_templates_falls_back_to_single_texts(wiki):
+    # the output of the first call doesn't split back into three parts
+    assert mediawiki.expand_templates(['{{a}}', '{{join}}', '{{b}}']) == ['<a>', 'joined', '<b>']
+    assert len(wiki.calls) == 4
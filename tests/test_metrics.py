@@ -0,0 +1,21 @@
+from metrics import Metrics
+
+
+def test_merge_adds_counts_and_latencies():
+    parent, worker = Metrics(), Metrics()
+    parent.count('hit', 2)
+    parent.observe('lookup', 1e-6)
+    worker.count('hit')
+    worker.count('miss', 3)
+    worker.observe('lookup', 0.5)
+    worker.observe('batch', 0.5)
+
+    parent.merge(worker)
+
+    snapshot = parent.snapshot()
+    assert snapshot['tokens']['hit'] == 3
+    assert snapshot['tokens']['miss'] == 3
+    assert snapshot['stages']['lookup']['count'] == 2
+    assert snapshot['stages']['lookup']['buckets']['1e-06'] == 1
+    assert snapshot['stages']['lookup']['buckets']['+Inf'] == 2
+    assert snapshot['stages']['batch']['sum'] == 0.5
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip('wikitextparser')
+pytest.importorskip('bs4')
+
+import wikitextparser as wtp
+
+import paradigm_cache
+from paradigm_cache import ParadigmCache
+
+
+def template(text):
+    return wtp.parse(text).templates[0]
+
+
+def verb(slogi, partner=''):
+    return template('{{гл ru 1a|основа=x|слоги={{по-слогам|' + slogi + '}}|соотв=' + partner + '|НП=1}}')
+
+
+def verb_variants(word_acc, endings):
+    # the infinitive and present forms stressed as it is
+    base = word_acc.replace('́', '')
+    tag = {'tag': {}, 'pos-grammeme': {'intr'}, 'pos': 'VERB'}
+    variants = [[[word_acc], base, tag, {'tag': {}}]]
+    for person, ending in endings:
+        variants.append([[word_acc[:-2] + ending], base, tag, {'tag': {'Person': person}}])
+    return variants
+
+
+def test_verb_key_keeps_only_presence_of_aspect_partner():
+    cache = ParadigmCache()
+    read, play = verb('чи|та́ть', 'прочитать'), verb('и|гра́ть', 'сыграть')
+    assert cache.key(read) == cache.key(play)
+    assert cache.key(read) != cache.key(verb('чи|та́ть'))
+    assert cache.key(verb('чи|та́ть', '<!-- -->')) == cache.key(verb('чи|та́ть'))
+
+
+def test_covers_a_learned_paradigm(monkeypatch):
+    pytest.importorskip('wiktextract')
+    from wikt_template_parser import is_cached
+
+    cache = ParadigmCache()
+    monkeypatch.setattr(paradigm_cache, 'paradigm_cache', cache)
+    read = verb('чи|та́ть', 'прочитать')
+    key = cache.key(read)
+    assert not is_cached(['чита́ть'], read)
+
+    cache.learn(key, ['чита́ть'], 'читать', verb_variants('чита́ть', [('1', 'ю'), ('2', 'ешь')]))
+    assert is_cached(['игра́ть'], verb('и|гра́ть', 'сыграть'))
+    # a different paradigm, and a lemma the shape's ending doesn't fit
+    assert not is_cached(['игра́ть'], verb('и|гра́ть'))
+    assert not cache.covers(key, 'нести')
+    assert not cache.covers(key, 'ёть')
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('wiktextract')
+
+import wikitextparser as wtp
+
+import paradigms
+import wiktparser
+from wikt_template_parser import parse_template_uncached
+
+# Hand-written expandtemplates responses, one per template text: not captured from the API, but tables
+# in the layout parse_template reads with forms typed from the declension, not generated by paradigms.
+# They check that the local engine and the table path agree, not that either agrees with ru.wiktionary
+with open(os.path.join(os.path.dirname(__file__), 'data', 'expandtemplates_handwritten.json'), encoding='utf-8') as f:
+    RESPONSES = json.load(f)
+
+# a noun for every stress scheme a-f and an adjective for every supported index
+HEADWORDS = {
+    'сущ ru f ina 1a': 'ко́мната', 'сущ ru m a 1a': 'студе́нт', 'сущ ru m ina 1b': 'сто́л',
+    'сущ ru n ina 2c': 'мо́ре', 'сущ ru n ina 1d': 'вино́', 'сущ ru m ina 1e': 'зу́б', 'сущ ru f ina 1f': 'губа́',
+    'прил ru 1a': 'краси́вый', 'прил ru 1b': 'молодо́й', 'прил ru 2a': 'ле́тний', 'прил ru 3a': 'ру́сский',
+    'прил ru 3b': 'друго́й', 'прил ru 4a': 'све́жий', 'прил ru 4b': 'большо́й',
+}
+
+
+def template_name(text):
+    return text[2:].split('|')[0]
+
+
+@pytest.mark.parametrize('text', sorted(RESPONSES, key=template_name), ids=template_name)
+def test_local_declension_matches_expanded_table(text, monkeypatch):
+    word_acc = [HEADWORDS[template_name(text)]]
+    expanded = []
+
+    def expand(template_text, language='ru'):
+        expanded.append(template_text)
+        return RESPONSES[template_text]['expandtemplates']['wikitext']
+
+    monkeypatch.setattr(wiktparser, 'get_wikitext_api_expandtemplates', expand)
+    template = wtp.parse(text).templates[0]
+    assert paradigms.is_local(template)
+    local = parse_template_uncached(word_acc, template)
+    assert expanded == []
+
+    # the same template through the expanded table
+    monkeypatch.setattr(paradigms, 'noun_variants', lambda *args: None)
+    monkeypatch.setattr(paradigms, 'adjective_variants', lambda *args: None)
+    remote = parse_template_uncached(word_acc, template)
+    assert expanded == [text]
+
+    assert local == remote
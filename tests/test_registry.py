@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+from accentizer import Accentizer
+from dictionary import AccentDictionary
+from registry import registry
+
+
+@pytest.fixture
+def path(tmp_path):
+    dictionary = AccentDictionary(path=str(tmp_path))
+    dictionary.load()
+    dictionary.add_accent('молоко', 5)
+    dictionary.compact()
+    yield str(tmp_path)
+    registry.clear()
+
+
+def test_accentizers_share_dictionary_and_resolver(path):
+    first, second = Accentizer('dict', path), Accentizer('dict', path)
+    assert first.dictionary is second.dictionary
+    assert first.get_resolver() is second.get_resolver()
+    assert first.get_resolver().morpher is second.get_resolver().morpher
+    assert Accentizer('dict', path).get_accent('Молоко') == 5
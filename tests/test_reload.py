@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+from dictionary import AccentDictionary, POS_SET
+from registry import DictionaryHandle
+
+
+def compile_accents(path, accents):
+    dictionary = AccentDictionary(path=path)
+    dictionary.load()
+    for word, pos in accents.items():
+        dictionary.add_accent(word, pos)
+    dictionary.compact()
+    dictionary.compile()
+
+
+def test_recompile_while_reader_holds_old_version(tmp_path):
+    path = str(tmp_path)
+    compile_accents(path, {'молоко': 5, 'корова': 3})
+    handle = DictionaryHandle('mapped', path)
+    old = handle.current
+    assert old.accents['молоко'] == 5
+
+    # the old version stays mapped to the replaced file, rewriting it in place would SIGBUS its readers
+    compile_accents(path, {'облако': 0, 'голова' * 1000: 5})
+    new = handle.reload()
+
+    assert handle.version == 1
+    assert old.accents['молоко'] == 5
+    assert old.accents.get('корова') == 3
+    assert old.accents.get('облако') is None
+    assert new.accents['молоко'] == 5
+    assert new.accents.get('облако') == 0
+
+
+def test_reload_after_compact_keeps_old_homograph_tables(tmp_path):
+    path = str(tmp_path)
+    first = AccentDictionary(path=path)
+    first.load()
+    first.homographs_unresolvable['замок'] = [{1}, {}]
+    first.compact()
+
+    handle = DictionaryHandle('dict', path)
+    old = handle.current
+    assert not old.is_loaded('homographs_unresolvable')
+
+    # the next version replaces the table and its key index while the old one hasn't loaded them yet
+    second = AccentDictionary(path=path)
+    second.load()
+    second.homographs_unresolvable['замок'][POS_SET].add(3)
+    second.homographs_unresolvable['мука'] = [{0, 3}, {}]
+    second.compact()
+    new = handle.reload()
+
+    assert old.homograph_table('мука') is None
+    assert old.homographs_unresolvable['замок'][POS_SET] == {1}
+    assert 'мука' not in old.homographs_unresolvable
+    assert new.homograph_table('мука') == 'homographs_unresolvable'
+    assert new.homographs_unresolvable['замок'][POS_SET] == {1, 3}
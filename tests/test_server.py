@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+from server import AccentizerServer
+
+
+class StubAccentizer:
+    # accents the first letter of every text, records the batches it was called with
+    metrics = None
+
+    def __init__(self):
+        self.batches = []
+
+    def accentize_batch(self, texts):
+        self.batches.append(list(texts))
+        return [[(text, 0)] for text in texts]
+
+
+async def request(port, method, target, body=b'', headers=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = ['{} {} HTTP/1.1'.format(method, target), 'Connection: close']
+    headers = {'Content-Length': str(len(body)), **(headers or {})}
+    lines += ['{}: {}'.format(k, v) for k, v in headers.items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body.decode('utf-8'))
+
+
+def serve(test, **kwargs):
+    async def run():
+        accentizer = StubAccentizer()
+        server = AccentizerServer(accentizer, **kwargs)
+        await server.start('127.0.0.1', 0)
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            await test(server, accentizer, port)
+        finally:
+            await server.stop()
+    asyncio.run(run())
+
+
+def test_concurrent_requests_are_batched():
+    async def test(server, accentizer, port):
+        bodies = [json.dumps({'text': 'мама'}).encode('utf-8'),
+                  json.dumps({'texts': ['рама', 'дама']}).encode('utf-8'),
+                  json.dumps({'text': 'папа'}).encode('utf-8')]
+        responses = await asyncio.gather(*(request(port, 'POST', '/accentize', body) for body in bodies))
+
+        assert [status for status, _ in responses] == [200, 200, 200]
+        assert responses[0][1] == {'text': 'м́ама', 'accents': [['мама', 0]]}
+        assert responses[1][1]['texts'] == ['р́ама', 'д́ама']
+        assert len(accentizer.batches) == 1
+        assert sorted(accentizer.batches[0]) == ['дама', 'мама', 'папа', 'рама']
+
+        status, stats = await request(port, 'GET', '/stats')
+        assert status == 200
+        assert stats['requests'] == 3
+        assert stats['batches'] == 1
+        assert stats['mean_batch_size'] == 4
+    serve(test, max_wait=0.5)
+
+
+def test_bad_content_length():
+    async def test(server, accentizer, port):
+        for length in ('abc', '-5'):
+            status, _ = await request(port, 'POST', '/accentize', b'{}', {'Content-Length': length})
+            assert status == 400
+        server.max_body = 16
+        body = json.dumps({'text': 'молоко ' * 10}).encode('utf-8')
+        status, _ = await request(port, 'POST', '/accentize', body)
+        assert status == 413
+        assert accentizer.batches == []
+    serve(test)
@@ -0,0 +1,34 @@
+from suffix_model import SuffixModel
+
+ACCENTS = {
+    'вода': 3, 'среда': 4, 'звезда': 5, 'слобода': 5, 'погода': 3, 'природа': 4,
+    'высота': 5, 'красота': 6, 'широта': 5, 'работа': 3, 'забота': 3, 'охота': 3,
+    'мама': 1, 'рама': 1, 'дама': 1, 'панама': 3,
+}
+
+
+def test_predicts_training_words():
+    model = SuffixModel.build(ACCENTS, min_count=1)
+    for word in ('вода', 'высота', 'работа', 'мама'):
+        prediction = model.predict(word)
+        assert prediction is not None, word
+        assert prediction[0] == ACCENTS[word], word
+
+
+def test_predicts_held_out_form():
+    accents = dict(ACCENTS)
+    del accents['высота']
+    model = SuffixModel.build(accents, min_count=1)
+
+    # -ота after a stem with one vowel is stressed on the ending like широта
+    pos, confidence = model.predict('Высота')
+    assert pos == 5
+    assert 'высота'[pos] == 'а'
+    assert 0 < confidence <= 1
+
+
+def test_no_prediction_for_consonant_position():
+    # молоко is stressed at offset 1 from the end, the last letter of молок is a consonant
+    model = SuffixModel.build({'молоко': 5}, min_count=1)
+    assert model.predict('молоко') == (5, 1.0)
+    assert model.predict('молок') is None
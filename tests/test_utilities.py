@@ -0,0 +1,52 @@
+import pytest
+
+from utilities import count_vovels, count_vovels_batch, get_first_vovel_pos, get_first_vovel_pos_batch, normalize, \
+    put_accents, vovel_stats
+
+MARK = '́'
+
+
+@pytest.mark.parametrize('word, pos', [
+    ('облако', 0), ('Облако', 0), ('стол', 2), ('молоко', 1), ('вдрызг', 3),
+    ('ёж', 0), ('Ёлка', 0), ('всё', 2), ('мк', None), ('', None),
+])
+def test_first_vowel(word, pos):
+    assert get_first_vovel_pos(word) == pos
+
+
+def test_put_accents_first_middle_and_last_vowel():
+    text = 'Облако, корова и молоко.'
+    accents = [('Облако', 0), ('корова', 3), ('и', -1), ('молоко', 5)]
+    assert put_accents(text, accents) == 'О' + MARK + 'блако, коро' + MARK + 'ва и молоко' + MARK + '.'
+
+
+def test_put_accents_yo_and_repeated_words():
+    text = 'ёж, всё ёж'
+    accents = [('ёж', 0), ('всё', 2), ('ёж', None)]
+    assert put_accents(text, accents) == 'ё' + MARK + 'ж, всё' + MARK + ' ёж'
+
+
+def test_put_accents_keeps_text_without_words():
+    assert put_accents('', []) == ''
+    assert put_accents('123, 456', []) == '123, 456'
+
+
+@pytest.mark.parametrize('word, key', [
+    ('молоко', 'молоко'), ('Молоко', 'молоко'), ('МОЛОКО', 'молоко'),
+    ('ёж', 'еж'), ('Ёж', 'еж'), ('ЁЖ', 'еж'), ('берёза', 'береза'), ('БЕРЁЗА', 'береза'),
+])
+def test_normalize(word, key):
+    # positions index the key and the word alike
+    assert normalize(word) == key
+    assert len(key) == len(word)
+
+
+WORDS = ['облако', 'Облако', 'ОБЛАКО', 'стол', 'вдрызг', 'ёж', 'Ёлка', 'всё', 'ВСЁ', 'мк', '', 'а', 'Я',
+         'бере́за', 'достопримечательность', 'молоко', 'мк', '']
+
+
+def test_batch_vowel_stats_match_single_words():
+    assert count_vovels_batch(WORDS) == [count_vovels(word) for word in WORDS]
+    assert get_first_vovel_pos_batch(WORDS) == [get_first_vovel_pos(word) for word in WORDS]
+    assert vovel_stats(WORDS) == (count_vovels_batch(WORDS), get_first_vovel_pos_batch(WORDS))
+    assert count_vovels_batch([]) == [] and get_first_vovel_pos_batch([]) == []
@@ -0,0 +1,68 @@
+import bz2
+
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('wiktextract')
+
+import wikt_dump
+from dictionary import AccentDictionary
+
+# title: page text, one "accented form, opencorpora number" line per variant.
+# замки, read after замок, turns за́мки into a homograph, so the merge order shows in the result
+PAGES = [
+    ('замок', 'за́мок sing\nза́мки plur\nза́мками plur'),
+    ('замки', 'замки́ plur\nзамко́в plur'),
+    ('мука', 'му́ка sing\nмуки́ plur'),
+    ('кот', 'ко́т sing'), # one vowel, not a candidate
+    ('мука', 'мука́ sing'), # a second page of the title
+    ('облако', 'о́блако sing\nоблака́ plur\nо́блака sing'),
+    ('молоко', 'молоко́ sing'),
+]
+
+
+def parse_page(title, parsed):
+    # stands in for parse_wikt_ru, variants are read from the page text
+    variants = []
+    for line in parsed.string.split('\n'):
+        form, number = line.split()
+        variants.append([[form], title, {'tag': {'Number': number}, 'pos': 'NOUN'},
+                         {'tag': {'Number': number.title()}, 'pos': 'NOUN'}])
+    return variants
+
+
+def write_dump(file_name):
+    pages = ['<page><title>Шаблон:сущ</title><ns>10</ns><revision><text>за́мок sing</text></revision></page>',
+             '<page><title>замОк</title><ns>0</ns><redirect title="замок"/><revision><text>#перенаправление [[замок]]</text></revision></page>']
+    for title, text in PAGES:
+        pages.append('<page><title>{}</title><ns>0</ns><revision><text>{}</text></revision></page>'.format(title, text))
+    xml = '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">{}</mediawiki>'.format(''.join(pages))
+    with bz2.open(file_name, 'wb') as f:
+        f.write(xml.encode('utf-8'))
+
+
+def tables(dictionary):
+    return dictionary.accents, dictionary.homographs, dictionary.homographs_unresolvable
+
+
+def test_ingest_matches_serial_merge(tmp_path, monkeypatch):
+    monkeypatch.setattr(wikt_dump, 'parse_wikt_ru', parse_page)
+    dump = str(tmp_path / 'dump.xml.bz2')
+    write_dump(dump)
+
+    # serial: every candidate page parsed and merged in dump order by this process
+    serial = AccentDictionary(path=str(tmp_path))
+    serial.load()
+    pages = [page for chunk in wikt_dump.chunked_pages(wikt_dump.iter_pages(dump), 0, 100) for page in chunk]
+    assert [title for _, title, _ in pages] == ['замок', 'замки', 'мука', 'мука', 'облако', 'молоко']
+    for index, title, variants in wikt_dump.parse_pages(pages)[2]:
+        wikt_dump.merge_variants(serial, variants)
+    assert 'замки' in serial.homographs or 'замки' in serial.homographs_unresolvable
+
+    for processes in (1, 2):
+        path = tmp_path / str(processes)
+        path.mkdir()
+        dictionary = AccentDictionary(path=str(path))
+        dictionary.load()
+        wikt_dump.ingest(dictionary, dump, processes=processes, chunk_size=1)
+        assert tables(dictionary) == tables(serial)
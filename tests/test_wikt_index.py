@@ -0,0 +1,74 @@
+import bz2
+import os
+
+import pytest
+
+pytest.importorskip('pymorphy2')
+pytest.importorskip('lxml')
+
+from wikt_index import MultistreamIndex, index_file_name
+
+# pages of every bz2 stream after the siteinfo one, (title, text, redirect title or None)
+BLOCKS = [
+    [('корова', '== корова ==', None), ('молоко', '== молоко ==', None)],
+    [('R&D', 'a &amp; b', None), ('корову', '#перенаправление [[корова]]', 'корова')],
+    [('облако', '== облако ==', None)],
+]
+
+
+def page_xml(title, text, redirect):
+    title = title.replace('&', '&amp;')
+    redirect = '<redirect title="{}" />'.format(redirect) if redirect is not None else ''
+    return '<page><title>{}</title><ns>0</ns>{}<revision><text>{}</text></revision></page>'.format(title, redirect, text)
+
+
+@pytest.fixture
+def dump(tmp_path):
+    # a multistream dump and its index, returns the dump file name and {title: stream offset}
+    file_name = str(tmp_path / 'ruwiktionary-test-pages-articles-multistream.xml.bz2')
+    offsets = {}
+    index_lines = []
+    with open(file_name, 'wb') as f:
+        f.write(bz2.compress('<mediawiki><siteinfo><sitename>Викисловарь</sitename></siteinfo>'.encode('utf-8')))
+        for block in BLOCKS:
+            offset = f.tell()
+            for page_id, (title, text, redirect) in enumerate(block):
+                offsets[title] = offset
+                index_lines.append('{}:{}:{}\n'.format(offset, page_id, title))
+            f.write(bz2.compress(''.join(page_xml(*page) for page in block).encode('utf-8')))
+        f.write(bz2.compress(b'</mediawiki>'))
+    with bz2.open(index_file_name(file_name), 'wt', encoding='utf-8') as f:
+        f.writelines(index_lines)
+    return file_name, offsets
+
+
+def check_pages(index):
+    for block in BLOCKS:
+        for title, text, redirect in block:
+            assert index.page(title) == (text.replace('&amp;', '&'), redirect)
+    assert index.page('нет') is None
+
+
+def test_index_file(dump):
+    file_name, offsets = dump
+    assert index_file_name(file_name).endswith('-multistream-index.txt.bz2')
+    index = MultistreamIndex(file_name).load()
+    assert index.offsets == offsets
+    check_pages(index)
+    index.close()
+
+
+def test_scan_without_index_file(dump):
+    file_name, offsets = dump
+    os.remove(index_file_name(file_name))
+    index = MultistreamIndex(file_name).load()
+    assert index.offsets == offsets
+    check_pages(index)
+
+    # saved next to the dump and loaded on the next run without scanning
+    assert os.path.exists(index.file_name())
+    loaded = MultistreamIndex(file_name, block_cache_size=1).load()
+    assert loaded.offsets == offsets
+    check_pages(loaded)
+    # a block is decompressed once while its pages are read one after another
+    assert loaded.blocks.misses == len(BLOCKS)
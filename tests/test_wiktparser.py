@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('wiktextract')
+
+import wiktparser
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    # fetch_pages answering from a dict, the requested batches are recorded in calls
+    data = {'кот': ('== кот ==', 11, 'кот')}
+    calls = []
+
+    def fetch_pages(titles, language='ru'):
+        calls.append(list(titles))
+        return {title: data[title] for title in titles if title in data}
+
+    monkeypatch.setattr(wiktparser, 'fetch_pages', fetch_pages)
+    monkeypatch.setattr(wiktparser, 'prefetched', wiktparser.OrderedDict())
+    monkeypatch.setattr(wiktparser, 'api_cache', None)
+    return calls
+
+
+def test_page_expired_after_prefetch_is_fetched_again(pages, monkeypatch):
+    # the cached page expires between prefetch_pages checking it and get_wikitext_api taking it
+    monkeypatch.setattr(wiktparser, 'take', lambda kind, key: None)
+    assert wiktparser.get_wikitext_api('кот') == ('== кот ==', 'кот')
+    assert pages == [['кот'], ['кот']]
+
+
+def test_title_left_out_of_the_response(pages):
+    assert wiktparser.get_wikitext_api('пёс') == ('', 'пёс')
+    assert pages == [['пёс'], ['пёс']]
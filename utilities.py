@@ -1,14 +1,61 @@
+import re
+
 russian_vowels = {'а', 'о', 'у', 'э', 'ы', 'и', 'я', 'ё', 'ю', 'е', 'А', 'О', 'У', 'Э', 'Ы', 'И', 'Я', 'Ё', 'Ю', 'Е'}
 
+word_regex = re.compile(r'[а-яёА-ЯЁ́]+')
+find_words = word_regex.findall
+
+vowels = ''.join(sorted(russian_vowels))
+remove_vowels = str.maketrans('', '', vowels)
+# leading run of consonants and other non vowels of every line
+consonant_prefix_regex = re.compile(r'^[^{}\n]*'.format(vowels), re.MULTILINE)
+
+def normalize(word):
+    # dictionary key of a word form: lowercase with ё folded to е, same length as the word
+    return word.lower().replace('ё', 'е')
+
+
 def count_vovels(word):
-    vowels_counter = 0
-    for c in word:
-        if c in russian_vowels:
-            vowels_counter += 1
-    return vowels_counter
+    return len(word) - len(word.translate(remove_vowels))
 
 
 def get_first_vovel_pos(word):
+    # index of the first vowel, the accent position of a word with one vowel
     for i, c in enumerate(word):
         if c in russian_vowels:
-            return i + 1
\ No newline at end of file
+            return i
+
+
+def count_vovels_batch(words):
+    # vowel counts of all words with one translate over the joined words, words must not contain newlines
+    stripped = '\n'.join(words).translate(remove_vowels).split('\n')
+    return [len(word) - len(s) for word, s in zip(words, stripped)]
+
+
+def get_first_vovel_pos_batch(words):
+    # get_first_vovel_pos of all words with one regex pass, words must not contain newlines
+    prefixes = consonant_prefix_regex.findall('\n'.join(words))
+    return [len(p) if len(p) < len(word) else None for word, p in zip(words, prefixes)]
+
+
+def vovel_stats(words):
+    return count_vovels_batch(words), get_first_vovel_pos_batch(words)
+
+
+def put_accents(text, accents):
+    # accents: (word, pos) pairs in text order, as returned by Accentizer.accentize_batch,
+    # pos is the index of the stressed vowel and the mark goes right after it
+    parts = []
+    start = 0
+    for word, pos in accents:
+        i = text.find(word, start)
+        end = i + len(word)
+        if pos is not None and pos >= 0:
+            parts.append(text[start:i + pos + 1])
+            parts.append('́')
+            parts.append(text[i + pos + 1:end])
+        else:
+            parts.append(text[start:end])
+        start = end
+    parts.append(text[start:])
+    return ''.join(parts)
@@ -0,0 +1,166 @@
+import argparse
+import bz2
+import multiprocessing
+import os
+import re
+from collections import deque
+
+import wikitextparser as wtp
+from lxml import etree
+
+from checkpoint import Checkpoint
+from dictionary import AccentDictionary
+from morph import Morph
+from paradigm_cache import merge_stats, paradigm_cache
+from utilities import count_vovels, normalize
+from wiktparser import parse_wikt_ru, use_api_cache, use_local_dump
+
+word_regex = re.compile(r'[а-яёА-ЯЁ]+')
+
+
+def open_dump(file_name):
+    # pages-articles dump, plain or bz2 (multistream dumps are read as one stream)
+    if file_name.endswith('.bz2'):
+        return bz2.open(file_name, 'rb')
+    return open(file_name, 'rb')
+
+
+def iter_pages(file_name):
+    # (title, wikitext) of main namespace pages in dump order, redirects are skipped.
+    # Elements are freed as soon as they are read, so memory stays flat over the whole dump
+    with open_dump(file_name) as f:
+        for _, page in etree.iterparse(f, events=('end',), tag='{*}page'):
+            if page.findtext('{*}ns') == '0' and page.find('{*}redirect') is None:
+                yield page.findtext('{*}title'), page.findtext('{*}revision/{*}text') or ''
+
+            page.clear()
+            while page.getprevious() is not None:
+                del page.getparent()[0]
+
+
+def is_candidate(title):
+    return word_regex.fullmatch(title) is not None and count_vovels(title) >= 2
+
+
+def parse_pages(pages):
+    # worker: variants of every (index, title, wikitext) page of a chunk,
+    # with the worker's pid and its paradigm cache stats
+    result = []
+    for index, title, text in pages:
+        try:
+            variants = parse_wikt_ru(title, wtp.parse(text))
+        except Exception as e: # one broken page must not stop the build
+            print('failed', title, repr(e))
+            variants = []
+        result.append((index, title, variants))
+    return os.getpid(), paradigm_cache.stats(), result
+
+
+def merge_variants(dictionary, variants):
+    # wiktparser.add_variants rules on an AccentDictionary: a form with a new accent position
+    # turns the word into a homograph and the variants are merged again, so that its other forms
+    # are added as homographs too
+    for variant in variants:
+        for form in variant[0]:
+            if '́' not in form: continue
+            word = normalize(form.replace('́', ''))
+            pos = form.index('́') - 1
+            if 'ё' in form or count_vovels(word) < 2: continue
+
+            if word in dictionary.homographs or word in dictionary.homographs_unresolvable:
+                dictionary.add_homograph(word, variant_morph(variant), pos)
+                continue
+
+            if word in dictionary.accents and pos != dictionary.accents[word]:
+                dictionary.add_homograph(word, variant_morph(variant), pos)
+                merge_variants(dictionary, variants)
+                return
+
+            if word not in dictionary.accents:
+                dictionary.add_accent(word, pos)
+
+
+def variant_morph(variant):
+    morph = Morph()
+    morph.set_base(variant[1])
+    morph.fill_tags_from_variant(variant)
+    return morph
+
+
+def chunked_pages(pages, start, chunk_size):
+    # chunks of (index, title, wikitext) candidate pages after the first start pages,
+    # with the number of pages read so far
+    chunk = []
+    for index, (title, text) in enumerate(pages):
+        if index < start or not is_candidate(title): continue
+        chunk.append((index, title, text))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ingest(dictionary, file_name, processes=None, chunk_size=32, checkpoint=None):
+    # Pages are parsed by a process pool, results are merged in dump order by this process,
+    # so the dictionary ends up the same as after a serial run whatever the number of workers.
+    processes = processes or os.cpu_count()
+    start = checkpoint.index if checkpoint is not None else 0
+    chunks = chunked_pages(iter_pages(file_name), start, chunk_size)
+
+    with multiprocessing.Pool(processes) as pool:
+        # bounded number of chunks in flight, the dump is read only as fast as results are merged
+        pending = deque()
+        cache_stats = {} # pid: latest paradigm cache stats of the worker
+
+        def merge(chunk_result):
+            pid, stats, result = chunk_result
+            cache_stats[pid] = stats
+            for index, title, variants in result:
+                merge_variants(dictionary, variants)
+            if checkpoint is not None and result:
+                checkpoint.index, checkpoint.word = result[-1][0] + 1, result[-1][1]
+                checkpoint.commit(dictionary, 5)
+
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse_pages, (chunk,)))
+            if len(pending) >= 2 * processes:
+                merge(pending.popleft().get())
+        while pending:
+            merge(pending.popleft().get())
+
+    print('paradigm cache:', merge_stats(cache_stats.values()))
+
+    if checkpoint is not None:
+        checkpoint.commit(dictionary)
+    else:
+        dictionary.save_if_changed()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Adds accents of a ruwiktionary dump to the dictionary')
+    parser.add_argument('dump', help='pages-articles .xml or .xml.bz2')
+    parser.add_argument('--dictionary', default='.', help='dictionary directory')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='worker processes, all cores by default')
+    parser.add_argument('--chunk-size', type=int, default=32, help='pages per worker task')
+    parser.add_argument('--local-lookups', action='store_true',
+                        help='read pages of lookup words from the dump itself, it must be a multistream .bz2')
+    args = parser.parse_args(args)
+
+    if args.local_lookups:
+        use_local_dump(args.dump)
+
+    dictionary = AccentDictionary(path=args.dictionary)
+    dictionary.load()
+    use_api_cache(dictionary.file_name('wiktionary_cache', '.sqlite'))
+
+    # restarted builds continue after the last merged page
+    checkpoint = Checkpoint(dictionary.file_name('dump_checkpoint'))
+    checkpoint.load()
+    checkpoint.check_journal(dictionary.journal_offset)
+
+    ingest(dictionary, args.dump, args.processes, args.chunk_size, checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import bz2
+import html
+import os
+import pickle
+import re
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+from lxml import etree
+
+from morph_cache import BoundedCache
+
+title_regex = re.compile(rb'<title>(.*?)</title>')
+page_regex = re.compile(rb'<page>.*?</page>', re.DOTALL)
+
+
+def index_file_name(dump_file):
+    # ruwiktionary-...-pages-articles-multistream.xml.bz2 -> ...-multistream-index.txt.bz2
+    return re.sub(r'\.xml\.bz2$', '-index.txt.bz2', dump_file)
+
+
+def read_stream(f, offset):
+    # decompressed bz2 stream starting at offset
+    f.seek(offset)
+    decompressor = bz2.BZ2Decompressor()
+    parts = []
+    while not decompressor.eof:
+        data = f.read(1 << 16)
+        if not data:
+            break
+        parts.append(decompressor.decompress(data))
+    return b''.join(parts)
+
+
+def scan_streams(file_name) -> Iterator[Tuple[int, bytes]]:
+    # (offset, decompressed data) of every bz2 stream of a multistream file
+    with open(file_name, 'rb') as f:
+        decompressor = bz2.BZ2Decompressor()
+        parts = []
+        start = consumed = 0
+        while True:
+            data = f.read(1 << 20)
+            if not data:
+                break
+            while data:
+                parts.append(decompressor.decompress(data))
+                if not decompressor.eof:
+                    consumed += len(data)
+                    break
+                consumed += len(data) - len(decompressor.unused_data)
+                yield start, b''.join(parts)
+                data = decompressor.unused_data
+                decompressor = bz2.BZ2Decompressor()
+                parts = []
+                start = consumed
+
+
+def parse_block(data):
+    # {title: (wikitext, redirect title or None)} of the pages of a decompressed block
+    pages = {}
+    for match in page_regex.finditer(data):
+        page = etree.fromstring(match.group())
+        redirect = page.find('redirect')
+        pages[page.findtext('title')] = (page.findtext('revision/text') or '',
+                                         redirect.get('title') if redirect is not None else None)
+    return pages
+
+
+class MultistreamIndex:
+    # Title -> offset of the bz2 stream holding the page in a multistream dump,
+    # so a page is read by decompressing one block of about 100 pages instead of the whole dump.
+    # Built from the dump's index-multistream.txt.bz2 when it is there, otherwise by scanning the dump once,
+    # and pickled next to the dump.
+
+    def __init__(self, dump_file, block_cache_size=64):
+        self.dump_file = dump_file
+        self.offsets: Dict[str, int] = {}
+        self.blocks = BoundedCache(block_cache_size) # decoded blocks by offset
+        self.file = None
+        self.file_pid = None # forked workers open the dump again instead of sharing the file position
+        self.lock = threading.Lock() # threads share the file position and the block cache
+
+    def file_name(self):
+        return self.dump_file + '.index.pickle'
+
+    def build_from_index(self, index_file):
+        # lines are offset:page id:title
+        with bz2.open(index_file, 'rt', encoding='utf-8') as f:
+            for line in f:
+                offset, _, title = line.rstrip('\n').split(':', 2)
+                self.offsets[title] = int(offset)
+
+    def build_by_scanning(self):
+        for offset, data in scan_streams(self.dump_file):
+            for title in title_regex.findall(data):
+                self.offsets[html.unescape(title.decode('utf-8'))] = offset
+
+    def load(self):
+        if os.path.exists(self.file_name()) and os.path.getmtime(self.file_name()) >= os.path.getmtime(self.dump_file):
+            with open(self.file_name(), 'rb') as f:
+                self.offsets = pickle.load(f)
+        else:
+            if os.path.exists(index_file_name(self.dump_file)):
+                self.build_from_index(index_file_name(self.dump_file))
+            else:
+                print('index: scanning', self.dump_file)
+                self.build_by_scanning()
+            with open(self.file_name(), 'wb') as f:
+                pickle.dump(self.offsets, f, pickle.HIGHEST_PROTOCOL)
+
+        print('index:', len(self.offsets), 'titles')
+        return self
+
+    def read_block(self, offset):
+        if self.file is None or self.file_pid != os.getpid():
+            self.file = open(self.dump_file, 'rb')
+            self.file_pid = os.getpid()
+        return parse_block(read_stream(self.file, offset))
+
+    def page(self, title) -> Optional[Tuple[str, Optional[str]]]:
+        # (wikitext, redirect title or None), None if there is no such page
+        offset = self.offsets.get(title)
+        if offset is None:
+            return None
+        with self.lock:
+            return self.blocks.get(offset, self.read_block).get(title)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
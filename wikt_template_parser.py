@@ -371,8 +371,57 @@ def clean_comments(value):
     return re.sub(r'<!--.*-->', '', value)
 
 
+def get_degree_words(value):
+    words = [wikilink.text for wikilink in wtp.parse(value).wikilinks]
+    words += [w.strip() for w in re.search(r"\((.+)\)", value).group(1).split(',')]
+    return words
+
+
+def get_lookup_words(template):
+    lookup_words = []
+    for argument in template.arguments:
+        name, value = get_name_value(argument)
+        if name == 'степень' and value is not None:
+            lookup_words += get_degree_words(value)
+    return lookup_words
+
+
+def template_base(word_acc, template):
+    from wiktparser import get_word_from_slogi
+
+    slogi = get_word_from_slogi(template)
+    return slogi[0].replace('́', '') if slogi is not None else word_acc[0].replace('́', '')
+
+
+def is_cached(word_acc, template):
+    # True if parse_template will make the table from an already seen paradigm without expanding it
+    from paradigm_cache import paradigm_cache
+
+    key = paradigm_cache.key(template)
+    return key is not None and paradigm_cache.covers(key, template_base(word_acc, template))
+
+
 def parse_template(word_acc, template):
+    # таблицы уже встречавшейся парадигмы собираются из её кэшированной формы
+    from paradigm_cache import paradigm_cache
+
+    key = paradigm_cache.key(template)
+    if key is None:
+        return parse_template_uncached(word_acc, template)
+
+    base = template_base(word_acc, template)
+    variants = paradigm_cache.get(key, word_acc, base)
+    if variants is not None:
+        return variants, get_lookup_words(template)
+
+    variants, lookup_words = parse_template_uncached(word_acc, template)
+    paradigm_cache.learn(key, word_acc, base, variants)
+    return variants, lookup_words
+
+
+def parse_template_uncached(word_acc, template):
     from wiktparser import search_section_for_template, get_word_from_slogi, get_wikitext_api_expandtemplates
+    from paradigms import adjective_variants, noun_variants
 
     variants = []
     lookup_words = []
@@ -602,14 +651,14 @@ def parse_template(word_acc, template):
                 raise Exception
 
             if name == 'степень' and value is not None: # can be None?
-                assert value is not None
-                for wikilink in wtp.parse(value).wikilinks:
-                    lookup_words.append(wikilink.text)
-
-                for w in re.search(r"\((.+)\)", value).group(1).split(','):
-                    lookup_words.append(w.strip())
+                lookup_words += get_degree_words(value)
 
         # склонения по падежу / числу
+        # поддержанные индексы склоняются локально, без expandtemplates
+        local_variants = adjective_variants(word_acc, template, base, opencorpora_tag, universalD_tag)
+        if local_variants is not None:
+            return local_variants, lookup_words
+
         parsed = wtp.parse(get_wikitext_api_expandtemplates(template.string))
         table = table_to_2d(BeautifulSoup(parsed.string.replace('<br>','\n'), 'lxml').table)
         variants = parse_table_declension(table, base, opencorpora_tag, universalD_tag)
@@ -695,6 +744,11 @@ def parse_template(word_acc, template):
             print(template_name, d)
 
         # склонения по падежу / числу
+        # поддержанные индексы склоняются локально, без expandtemplates
+        local_variants = noun_variants(word_acc, template, base, opencorpora_tag, universalD_tag)
+        if local_variants is not None:
+            return local_variants, lookup_words
+
         parsed = wtp.parse(get_wikitext_api_expandtemplates(template.string))
         table = parsed.tables[0].data()
         _header = table.pop(0)
@@ -1,11 +1,16 @@
 import re
+from collections import OrderedDict
 from pprint import pprint
 import wiktextract
 from lxml import etree
-from requests import get
 import wikitextparser as wtp
 
-from wikt_template_parser import parse_template, known_template
+from api_cache import ApiCache, PAGES, TEMPLATES
+from checkpoint import Checkpoint
+from mediawiki import expand_templates, fetch_pages, fetch_revisions
+from paradigms import is_local
+from wikt_index import MultistreamIndex
+from wikt_template_parser import is_cached, parse_template, known_template
 from utilities import count_vovels
 
 replacements_opencorpora = {'adv ru': 'ADVB',
@@ -76,22 +81,68 @@ r_person_universalD = {
 }
 
 
-def get_wikitext_api(word, language='ru'):
-    resp = get('https://{}.wiktionary.org/w/api.php'.format(language), {
-        'action': 'query',
-        'titles': word,
-        'languages': language,
-        'prop': 'revisions',
-        'rvprop': 'content',
-        'format': 'json',
-    }).json()
-
-    pages = resp['query']['pages']
-    page = list(pages.values())[0]
-    if 'revisions' in page:
-        data = page['revisions'][0]['*']
+api_cache = None # ApiCache, API responses are kept on disk and reused by later runs when set
+
+
+def use_api_cache(file_name='wiktionary_cache.sqlite', ttl=30 * 24 * 3600):
+    global api_cache
+    api_cache = ApiCache(file_name, ttl)
+
+
+prefetched = OrderedDict() # (kind, key): response fetched ahead by a batch request, when there is no api_cache
+PREFETCH_LIMIT = 1000
+
+
+def take(kind, key):
+    # response fetched before, from the api cache or taken out of prefetched
+    if api_cache is not None:
+        return api_cache.get(kind, key)
+    return prefetched.pop((kind, key), None)
+
+
+def store(kind, key, value, revision=None):
+    if api_cache is not None:
+        api_cache.put(kind, key, value, revision)
     else:
-        data = ''
+        prefetched[(kind, key)] = value
+        if len(prefetched) > PREFETCH_LIMIT:
+            prefetched.popitem(last=False)
+
+
+def prefetch_pages(words, language='ru'):
+    # pages of words that aren't fetched yet, MAX_TITLES of them per request
+    missing = [w for w in dict.fromkeys(words) if (PAGES, language + ':' + w) not in prefetched
+               and (api_cache is None or not api_cache.has(PAGES, language + ':' + w))]
+    if not missing: return
+
+    for word, (data, revision, title) in fetch_pages(missing, language).items():
+        # a redirected title gets its target's page
+        store(PAGES, language + ':' + word, data, revision)
+
+
+def prefetch_templates(texts, language='ru'):
+    # expansions of template texts that aren't expanded yet, several of them per request
+    missing = [t for t in dict.fromkeys(texts) if (TEMPLATES, language + ':' + t) not in prefetched
+               and (api_cache is None or not api_cache.has(TEMPLATES, language + ':' + t))]
+    if not missing: return
+
+    for text, data in zip(missing, expand_templates(missing, language)):
+        store(TEMPLATES, language + ':' + text, data)
+
+
+def get_wikitext_api(word, language='ru'):
+    key = language + ':' + word
+    data = take(PAGES, key)
+    if data is None:
+        prefetch_pages([word], language)
+        data = take(PAGES, key)
+    if data is None:
+        # prefetch_pages skipped a cached page that has expired since, or the response left the title out
+        pages = fetch_pages([word], language)
+        if word not in pages:
+            return '', word
+        data, revision, title = pages[word]
+        store(PAGES, key, data, revision)
 
     if 'redirect' in data.lower() or 'перенаправление' in data.lower():
         new_word = re.search('\[\[([́а-яёА-ЯЁ]+)\]\]', data).group(1)
@@ -99,15 +150,45 @@ def get_wikitext_api(word, language='ru'):
 
     return data, word
 
+def revalidate_api_cache(language='ru'):
+    # asks for the current revisions of all cached pages, 50 titles per request,
+    # and keeps only the pages that haven't changed
+    prefix = language + ':'
+    titles = [key[len(prefix):] for key in api_cache.keys(PAGES) if key.startswith(prefix)]
+    revisions = fetch_revisions(titles, language)
+    api_cache.revalidate({prefix + title: revision for title, revision in revisions.items()})
+
+local_index = None # MultistreamIndex of a local dump, pages are read from it instead of the API when set
+
+
+def use_local_dump(dump_file):
+    global local_index
+    local_index = MultistreamIndex(dump_file).load()
+
+
+def get_wikitext_local(word, redirects=5):
+    # same result as get_wikitext_api, read from the local dump
+    page = local_index.page(word)
+    if page is None:
+        return '', word
+
+    data, redirect = page
+    if redirect is not None and redirects > 0:
+        return get_wikitext_local(redirect, redirects - 1)
+    return data, word
+
+
+def get_wikitext(word, language='ru'):
+    if local_index is not None and language == 'ru':
+        return get_wikitext_local(word)
+    return get_wikitext_api(word, language)
+
 def get_wikitext_api_expandtemplates(text, language='ru'):
-    resp = get('https://{}.wiktionary.org/w/api.php'.format(language), {
-        'action': 'expandtemplates',
-        'text': text,
-        'prop': 'wikitext',
-        'format': 'json',
-    }).json()
-
-    data = resp['expandtemplates']['wikitext']
+    key = language + ':' + text
+    data = take(TEMPLATES, key)
+    if data is None:
+        prefetch_templates([text], language)
+        data = take(TEMPLATES, key)
     return data
 
 def accent(*words):
@@ -355,6 +436,12 @@ def get_variants_from_section(section):
     if word_acc is None or not accent(*word_acc):
         return []
 
+    # templates parse_template may expand are expanded together, those declined by paradigms
+    # or made from an already seen paradigm aren't expanded
+    prefetch_templates([template.string for template in section.templates
+                        if known_template(template) and not is_local(template)
+                        and not is_cached(word_acc, template)])
+
     found_templates = False
     for template in section.templates:
         if known_template(template):
@@ -374,7 +461,7 @@ def get_variants_from_section(section):
 
 def parse_wikt_ru(word, parsed=None):
     if parsed is None:
-        wikitext, word = get_wikitext_api(word)
+        wikitext, word = get_wikitext(word)
         parsed = wtp.parse(wikitext)
 
     variants = []
@@ -395,6 +482,8 @@ def parse_wikt_ru(word, parsed=None):
                         variants += v
                         lookup_words += l
 
+    if local_index is None:
+        prefetch_pages(lookup_words)
     for word_lu in lookup_words:
         print('lookup word', word_lu)
         variants += parse_wikt_ru(word_lu)
@@ -465,14 +554,17 @@ if __name__ == "__main__":
     parser = Parser()
     parser.load()
 
-    skip = True
+    # pages of the dump come in the same order on every run, the build resumes after the last finished page
+    checkpoint = Checkpoint('wiktparser_checkpoint.pickle')
+    checkpoint.load()
+    pages = 0
+
     def word_cb(word, data):
-        global skip
-        if word == 'прыгать': skip = False
-        if skip: return
+        global pages
+        pages += 1
+        if pages <= checkpoint.index: return
 
-        if re.fullmatch(r'[а-яёА-ЯЁ]+', word):
-            if count_vovels(word) < 2: return
+        if re.fullmatch(r'[а-яёА-ЯЁ]+', word) and count_vovels(word) >= 2:
             parsed = wtp.parse(data)
             variants = parse_wikt_ru(word, parsed)
             # acc_word = word[:parser.accents[word]] + '́' + word[parser.accents[word]:]
@@ -481,6 +573,11 @@ if __name__ == "__main__":
 
             add_variants(variants)
 
+        checkpoint.advance(word)
+        if checkpoint.due(5):
+            parser.save()
+            checkpoint.save()
+
     ctx = wiktextract.parse_wiktionary(
         r'C:\Users\Admin\Downloads\ruwiktionary-20191120-pages-articles-multistream.xml', word_cb,
         capture_cb=None,
@@ -489,6 +586,9 @@ if __name__ == "__main__":
         pronunciations=False,
         redirects=False)
 
+    parser.save()
+    checkpoint.save()
+
 
     # for word in list(parser.accents):
     #     if word == 'абиетин': skip = False